@@ -1,9 +1,12 @@
 from flask import Flask
 from config import Config
+from .core.json_provider import CompactJSONProvider
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    # JSON compacto (orjson quando instalado), com datas do Oracle em ISO 8601
+    app.json = CompactJSONProvider(app)
 
     # Registra as rotas (endpoints)
     with app.app_context():
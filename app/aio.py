@@ -0,0 +1,625 @@
+"""
+Modo assíncrono (ASGI) para /api/buscar e /api/atualizar.
+
+Usa as conexões asyncio do 'oracledb' e um pool assíncrono próprio, de modo
+que muitas buscas concorrentes compartilham poucos workers. As demais rotas
+(página, edição de queries, monitoramento) continuam no Flask, chamado em
+uma thread. Ponto de entrada: 'asgi.py' na raiz do projeto.
+"""
+import asyncio
+import io
+import json
+import sys
+import weakref
+
+import oracledb
+from config import Config
+from . import db
+from .core import columnar, compression, metrics, query_manager
+from .core.admission import admission, AdmissionRejected
+from .core.result_cache import result_cache
+
+# --- Pool Assíncrono (único por processo/event loop) ---
+_async_pool = None
+_async_pool_lock = None
+
+async def _init_session_async(connection, requested_tag):
+    """Callback do pool: ativa a ROLE apenas em sessões recém-criadas."""
+    with connection.cursor() as cursor:
+        await cursor.execute(db._build_set_role_plsql())
+
+async def get_async_pool():
+    """Cria (na primeira chamada) e retorna o pool assíncrono."""
+    global _async_pool, _async_pool_lock
+    if _async_pool is None:
+        if _async_pool_lock is None:
+            _async_pool_lock = asyncio.Lock()
+        async with _async_pool_lock:
+            if _async_pool is None:
+                db._build_set_role_plsql()
+                _async_pool = oracledb.create_pool_async(
+                    user=Config.DB_USER,
+                    password=Config.DB_PASSWORD,
+                    dsn=Config.DB_DSN,
+                    min=Config.DB_POOL_MIN,
+                    max=Config.DB_POOL_MAX,
+                    increment=Config.DB_POOL_INCREMENT,
+                    session_callback=_init_session_async,
+                    ping_interval=Config.DB_POOL_PING_INTERVAL,
+                    getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                    wait_timeout=Config.DB_POOL_WAIT_TIMEOUT * 1000,
+                    stmtcachesize=Config.DB_STMT_CACHE_SIZE or db._default_stmt_cache_size()
+                )
+    return _async_pool
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close(force=True)
+        _async_pool = None
+
+# Sessões interrompidas por 'connection.cancel()': voltam ao pool descartadas
+_cancelled_connections = weakref.WeakSet()
+
+async def _with_cancel(connection, coro):
+    """
+    Executa 'coro' com o timeout de ASYNC_REQUEST_TIMEOUT. Se estourar o tempo
+    ou a tarefa for cancelada (cliente desconectou), interrompe a chamada em
+    andamento no servidor com 'connection.cancel()'.
+    """
+    try:
+        return await asyncio.wait_for(coro, timeout=Config.ASYNC_REQUEST_TIMEOUT)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        connection.cancel()
+        _cancelled_connections.add(connection)
+        raise
+
+async def _release_connection(pool, connection):
+    """
+    Devolve a sessão ao pool. Depois de um cancel() o estado da sessão é
+    incerto (o ORA-01013 pode ainda não ter chegado): ela é descartada e o
+    pool abre outra quando precisar.
+    """
+    if connection in _cancelled_connections:
+        _cancelled_connections.discard(connection)
+        await pool.drop(connection)
+    else:
+        await pool.release(connection)
+
+# --- Operações de Banco (espelham as funções de app/db.py) ---
+
+async def execute_dynamic_query_async(sql, bind_params, page_size=None, offset=0, timer=metrics.NULL_TIMER, compact=False,
+                                      max_rows=None, fetch_options=None):
+    """Versão assíncrona de 'db.execute_dynamic_query'."""
+    with timer.stage("prepare"):
+        sql, final_bind_params = db._prepare_query(sql, bind_params)
+        sql, final_bind_params, added_alias = db._limit_query(sql, final_bind_params, page_size, offset, max_rows)
+        arraysize, prefetch_rows = db._fetch_sizes(fetch_options, page_size, max_rows)
+    timer.set_statement(sql, final_bind_params)
+
+    pool = await get_async_pool()
+    with timer.stage("acquire"):
+        connection = await pool.acquire()
+    try:
+        cursor = connection.cursor()
+        cursor.arraysize = arraysize
+        cursor.prefetchrows = prefetch_rows
+        cursor.outputtypehandler = db.json_output_type_handler
+
+        try:
+            with timer.stage("execute"):
+                await _with_cancel(connection, cursor.execute(sql, final_bind_params))
+            with timer.stage("fetch"):
+                rows = await _with_cancel(connection, cursor.fetchall())
+        except oracledb.Error as e:
+            print(f"Erro ao executar query dinâmica (async): {e}")
+            raise
+
+        col_names = [desc[0] for desc in cursor.description]
+        if added_alias:
+            col_names = db.restore_rowid_headers(col_names)
+        count, has_more, truncated = db._take_rows(len(rows), 0, page_size, offset, max_rows)
+        rows = rows[:count]
+        next_offset = offset + count if has_more else None
+        with timer.stage("build"):
+            results = rows if compact else [dict(zip(col_names, row)) for row in rows]
+        return {"headers": col_names, "rows": results, "next_offset": next_offset, "truncated": truncated}
+    finally:
+        await _release_connection(pool, connection)
+
+async def stream_dynamic_query_async(sql, bind_params, page_size=None, offset=0, timer=metrics.NULL_TIMER,
+                                     max_rows=None, fetch_options=None):
+    """
+    Gerador assíncrono: 1º item = cabeçalhos, depois lotes de tuplas e, por
+    fim, a tupla (next_offset, truncated). Mesmo protocolo de 'db.QueryStream'.
+    """
+    sql, final_bind_params = db._prepare_query(sql, bind_params)
+    sql, final_bind_params, added_alias = db._limit_query(sql, final_bind_params, page_size, offset, max_rows)
+    arraysize, prefetch_rows = db._fetch_sizes(fetch_options, page_size, max_rows)
+
+    timer.set_statement(sql, final_bind_params)
+
+    pool = await get_async_pool()
+    with timer.stage("acquire"):
+        connection = await pool.acquire()
+    try:
+        cursor = connection.cursor()
+        cursor.arraysize = arraysize
+        cursor.prefetchrows = prefetch_rows
+        cursor.outputtypehandler = db.json_output_type_handler
+        with timer.stage("execute"):
+            await _with_cancel(connection, cursor.execute(sql, final_bind_params))
+        col_names = [desc[0] for desc in cursor.description]
+        yield db.restore_rowid_headers(col_names) if added_alias else col_names
+
+        row_count = 0
+        has_more = truncated = False
+        while not (has_more or truncated):
+            rows = await _with_cancel(connection, cursor.fetchmany())
+            if not rows:
+                break
+            count, has_more, truncated = db._take_rows(len(rows), row_count, page_size, offset, max_rows)
+            rows = rows[:count]
+            row_count += len(rows)
+            if rows:
+                yield rows
+        yield (offset + row_count if has_more else None), truncated
+    finally:
+        await _release_connection(pool, connection)
+
+async def execute_dynamic_update_async(target_table, target_rowids, updates_to_make, update_rules,
+                                       batch_size=None, timer=metrics.NULL_TIMER):
+    """Versão assíncrona de 'db.execute_dynamic_update' (mesmo retorno)."""
+    query_update_final, update_bind_params = db.build_update_statement(
+        target_table, updates_to_make, update_rules
+    )
+    if not target_rowids:
+        raise ValueError("Nenhum ROWID foi selecionado para alteração.")
+
+    batch_size = batch_size or Config.DB_UPDATE_BATCH_SIZE
+    timer.set_statement(query_update_final, update_bind_params)
+    pool = await get_async_pool()
+    with timer.stage("acquire"):
+        connection = await pool.acquire()
+    try:
+        cursor = connection.cursor()
+
+        async def run():
+            updated_count = 0
+            row_errors = []
+            for start in range(0, len(target_rowids), batch_size):
+                batch_rowids = target_rowids[start:start + batch_size]
+                batch_binds = [dict(update_bind_params, p_rowid=row_id) for row_id in batch_rowids]
+                await cursor.executemany(query_update_final, batch_binds,
+                                         batcherrors=True, arraydmlrowcounts=True)
+                for error in cursor.getbatcherrors():
+                    row_errors.append({"rowid": batch_rowids[error.offset], "error": error.message})
+                updated_count += sum(cursor.getarraydmlrowcounts())
+            return updated_count, row_errors
+
+        try:
+            with timer.stage("execute"):
+                updated_count, row_errors = await _with_cancel(connection, run())
+            if row_errors:
+                print(f"Erro em {len(row_errors)} linha(s) durante o UPDATE dinâmico. Executando ROLLBACK.")
+                await connection.rollback()
+                return {"updated_count": 0, "row_errors": row_errors}
+            with timer.stage("commit"):
+                await connection.commit()
+            return {"updated_count": updated_count, "row_errors": []}
+        except BaseException as e:
+            # Inclui timeout/cancelamento: nada fica pendente na sessão
+            print(f"Erro durante o UPDATE dinâmico (async): {e}")
+            try:
+                await connection.rollback()
+            except BaseException as rollback_error:
+                # Depois de um cancel() o ROLLBACK também pode falhar: o erro
+                # original é o que sobe (a sessão é descartada do pool)
+                print(f"Erro no ROLLBACK do UPDATE dinâmico (async): {rollback_error}")
+            raise
+    finally:
+        await _release_connection(pool, connection)
+
+# --- Handlers HTTP ---
+
+async def api_buscar_async(data, dumps):
+    """
+    Mesmo contrato de 'routes.api_buscar', sem "row_hashes" e sem o modo
+    colunar (ver _flask_only). Retorna (status, payload) ou um stream.
+    """
+    query_id = data.get('query_id')
+    params = data.get('params')
+
+    if not query_id or not params:
+        return 400, {"error": "Query ID e Parâmetros são obrigatórios."}
+
+    try:
+        page_size = db.normalize_page_size(data.get('page_size'))
+        offset = db.decode_page_cursor(data.get('cursor'))
+        compact = db.normalize_row_format(data.get('format')) == "compact"
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+    query_obj = query_manager.get_query_by_id(query_id)
+    if not query_obj:
+        return 404, {"error": "Query não encontrada."}
+
+    missing = query_manager.get_missing_required_params(query_obj, params)
+    if missing:
+        return 400, {"error": f"Parâmetros obrigatórios não informados: {', '.join(missing)}"}
+
+    update_rules = query_obj.get("update_rules", {})
+    max_rows = db.query_max_rows(query_obj)
+    try:
+        fetch_options = db.query_fetch_options(query_obj)
+    except ValueError as e:
+        return 500, {"error": str(e)}
+    timer = metrics.RequestTimer("search", query_id)
+
+    if data.get('stream'):
+        try:
+            release = await admission.acquire_async(query_obj, timer)
+        except BaseException:
+            timer.finish(error=True)
+            raise
+        try:
+            source = stream_dynamic_query_async(query_obj['sql'], params, page_size, offset, timer, max_rows,
+                                                fetch_options)
+            headers = await source.__anext__()
+            first = await source.__anext__()
+        except BaseException:
+            release()
+            raise
+        if not isinstance(first, list):
+            await source.aclose()
+            release()
+            timer.finish()
+            return 404, {"message": "Nenhum registro encontrado."}
+        return _NdjsonStream(source, headers, first, update_rules, dumps, timer, max_rows, release)
+
+    cache_key = None
+    results = None
+    if result_cache.enabled:
+        cache_key = result_cache.make_key(query_id, query_obj['sql'], params, page_size, offset, compact=compact,
+                                          max_rows=max_rows)
+        with timer.stage("cache"):
+            results = result_cache.get(cache_key)
+    if results is None:
+        generation = result_cache.generation
+        try:
+            release = await admission.acquire_async(query_obj, timer)
+            try:
+                results = await execute_dynamic_query_async(query_obj['sql'], params, page_size, offset, timer,
+                                                            compact, max_rows, fetch_options)
+            finally:
+                release()
+        except BaseException:
+            timer.finish(error=True)
+            raise
+        if cache_key is not None:
+            result_cache.put(cache_key, results, generation)
+
+    if not results.get("rows"):
+        timer.finish()
+        return 404, {"message": "Nenhum registro encontrado."}
+
+    results = dict(results)
+    next_offset = results.pop("next_offset")
+    if page_size:
+        results["next_cursor"] = db.encode_page_cursor(next_offset) if next_offset is not None else None
+    results["update_rules"] = update_rules
+    results["max_rows"] = max_rows
+    return 200, results, timer
+
+async def api_atualizar_async(data, dumps):
+    """Mesmo contrato de 'routes.api_atualizar', sem "return_rows" e "async" (ver _flask_only)."""
+    query_id = data.get('query_id')
+    target_rowids = data.get('rowids')
+    updates = data.get('updates')
+
+    if not query_id or not target_rowids or not updates:
+        return 400, {"error": "Dados insuficientes para atualização."}
+
+    query_obj = query_manager.get_query_by_id(query_id)
+    if not query_obj:
+        return 404, {"error": "Query não encontrada."}
+
+    target_table = query_obj.get("target_table")
+    update_rules = query_obj.get("update_rules", {})
+
+    if not target_table:
+        return 500, {"error": "'target_table' não definida no JSON para esta query."}
+
+    timer = metrics.RequestTimer("update", query_id)
+    try:
+        result = await execute_dynamic_update_async(target_table, target_rowids, updates, update_rules, timer=timer)
+    except BaseException:
+        timer.finish(error=True)
+        raise
+    timer.finish(rows=result["updated_count"], error=bool(result["row_errors"]))
+
+    if result["updated_count"]:
+        result_cache.invalidate_queries(query_manager.get_query_ids_for_table(target_table))
+
+    if result["row_errors"]:
+        return 400, {
+            "error": f"{len(result['row_errors'])} linha(s) falharam. Nenhuma alteração foi salva (ROLLBACK).",
+            "row_errors": result["row_errors"]
+        }
+
+    return 200, {
+        "success": True,
+        "updated_count": result["updated_count"],
+        "message": f"Sucesso! {result['updated_count']} linhas foram atualizadas e comitadas."
+    }
+
+class _NdjsonStream:
+    """Resposta NDJSON no mesmo formato de 'routes._ndjson_search_response'."""
+
+    def __init__(self, source, headers, first_batch, update_rules, dumps, timer, max_rows=None, release=None):
+        self.timer = timer
+        self.max_rows = max_rows
+        self.release = release
+        self.source = source
+        self.headers = headers
+        self.first_batch = first_batch
+        self.update_rules = update_rules
+        self.dumps = dumps
+
+    async def chunks(self):
+        dumps = self.dumps
+        row_count = 0
+        sent_bytes = 0
+        next_offset = None
+        truncated = False
+        item = self.first_batch
+        try:
+            yield dumps({"headers": self.headers, "update_rules": self.update_rules}) + "\n"
+            while True:
+                if isinstance(item, list):
+                    row_count += len(item)
+                    # Um chunk por lote do cursor (não um por linha)
+                    with self.timer.stage("serialize"):
+                        chunk = "".join(dumps(list(row)) + "\n" for row in item)
+                    sent_bytes += len(chunk)
+                    yield chunk
+                else:
+                    next_offset, truncated = item
+                try:
+                    with self.timer.stage("fetch"):
+                        item = await self.source.__anext__()
+                except StopAsyncIteration:
+                    break
+        except BaseException:
+            self.timer.finish(rows=row_count, response_bytes=sent_bytes, error=True)
+            raise
+        finally:
+            # Libera a vaga do controle de admissão (também se o cliente desconectar)
+            if self.release is not None:
+                self.release()
+        chunk = dumps({
+            "done": True,
+            "row_count": row_count,
+            "next_cursor": db.encode_page_cursor(next_offset) if next_offset is not None else None,
+            "truncated": truncated,
+            "max_rows": self.max_rows
+        }) + "\n"
+        self.timer.finish(rows=row_count, response_bytes=sent_bytes + len(chunk))
+        yield chunk
+
+# --- Aplicação ASGI ---
+
+ASYNC_ROUTES = {
+    "/api/buscar": api_buscar_async,
+    "/api/atualizar": api_atualizar_async,
+}
+
+def _flask_only(handler, data):
+    """
+    Opções que só as rotas do Flask implementam; essas requisições são
+    repassadas a ele com o corpo já lido:
+    - busca com "row_hashes" ou de query com "fetch_mode": "columnar";
+    - update com "return_rows" ou em segundo plano ("async": true: o job e o
+      /api/jobs/<id> usam o mesmo job_manager deste processo).
+    """
+    if handler is api_atualizar_async:
+        return bool(data.get('async') or data.get('return_rows'))
+    if data.get('row_hashes'):
+        return True
+    query_obj = query_manager.get_query_by_id(data.get('query_id'))
+    return query_obj is not None and columnar.is_columnar(query_obj)
+
+def create_asgi_app(flask_app):
+    """
+    Monta a aplicação ASGI: as rotas de ASYNC_ROUTES rodam no event loop,
+    o resto é repassado ao Flask (WSGI) em uma thread.
+    """
+    dumps = flask_app.json.dumps
+
+    async def asgi_app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await _lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        handler = ASYNC_ROUTES.get(scope["path"])
+        if handler is None or scope["method"] != "POST":
+            await _call_wsgi(flask_app, scope, receive, send)
+            return
+
+        # Mesma negociação do after_request do Flask (gzip/brotli)
+        accept_encoding = dict(scope.get("headers", [])).get(b"accept-encoding", b"").decode("latin-1")
+        encoding = compression.choose_encoding(accept_encoding)
+
+        body = await _read_body(receive)
+        try:
+            data = json.loads(body or b"null") or {}
+        except ValueError:
+            await _send_json(send, 400, {"error": "JSON inválido."}, dumps)
+            return
+
+        if _flask_only(handler, data):
+            await _call_wsgi(flask_app, scope, receive, send, body)
+            return
+
+        # Cliente desconectou antes da resposta: cancela a tarefa (e a chamada no banco)
+        task = asyncio.ensure_future(handler(data, dumps))
+        watcher = asyncio.ensure_future(_wait_disconnect(receive))
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done():
+            task.cancel()
+            return
+        watcher.cancel()
+
+        try:
+            result = task.result()
+        except asyncio.TimeoutError:
+            await _send_json(send, 503, {"error": "Tempo limite da requisição excedido."}, dumps)
+            return
+        except AdmissionRejected as e:
+            await _send_json(send, e.status, {"error": str(e)}, dumps,
+                             extra_headers=[(b"retry-after", str(e.retry_after).encode("ascii"))])
+            return
+        except Exception as e:
+            print(e)
+            prefix = "Erro ao atualizar" if handler is api_atualizar_async else "Erro interno no servidor"
+            await _send_json(send, 500, {"error": f"{prefix}: {e}"}, dumps)
+            return
+
+        if isinstance(result, _NdjsonStream):
+            await _send_ndjson(send, result, dumps, encoding)
+        elif len(result) == 3:
+            # Resposta de busca: mede a serialização e fecha as métricas
+            status, payload, timer = result
+            with timer.stage("serialize"):
+                body = dumps(payload).encode("utf-8")
+            timer.finish(rows=len(payload["rows"]), response_bytes=len(body))
+            await _send_body(send, status, body, encoding)
+        else:
+            await _send_json(send, result[0], result[1], dumps, encoding)
+
+    return asgi_app
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await close_async_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return body
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def _send_json(send, status, payload, dumps, encoding=None, extra_headers=()):
+    await _send_body(send, status, dumps(payload).encode("utf-8"), encoding, extra_headers)
+
+async def _send_body(send, status, body, encoding=None, extra_headers=()):
+    headers = [(b"content-type", b"application/json"), (b"vary", b"Accept-Encoding"), *extra_headers]
+    if encoding and status == 200 and len(body) >= Config.COMPRESSION_MIN_BYTES:
+        body = compression.compress_bytes(body, encoding)
+        headers.append((b"content-encoding", encoding.encode("ascii")))
+    headers.append((b"content-length", str(len(body)).encode("ascii")))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+async def _send_ndjson(send, stream, dumps, encoding=None):
+    headers = [(b"content-type", b"application/x-ndjson"), (b"vary", b"Accept-Encoding")]
+    compressor = None
+    if encoding:
+        compressor = compression.StreamCompressor(encoding)
+        headers.append((b"content-encoding", encoding.encode("ascii")))
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def send_chunk(text):
+        data = text.encode("utf-8")
+        if compressor:
+            data = compressor.chunk(data)
+        await send({"type": "http.response.body", "body": data, "more_body": True})
+
+    chunks = stream.chunks()
+    try:
+        async for chunk in chunks:
+            await send_chunk(chunk)
+    except Exception as e:
+        # O status HTTP já foi enviado; o erro segue como última linha
+        print(e)
+        await send_chunk(dumps({"error": f"Erro interno no servidor: {e}"}) + "\n")
+    finally:
+        # Devolve a sessão ao pool mesmo se o cliente desconectar no meio
+        await chunks.aclose()
+        await stream.source.aclose()
+    await send({"type": "http.response.body", "body": compressor.finish() if compressor else b""})
+
+async def _call_wsgi(flask_app, scope, receive, send, body=None):
+    """
+    Ponte mínima ASGI -> WSGI (a resposta do Flask é repassada em pedaços).
+    'body' = corpo da requisição já lido do 'receive'.
+    """
+    if body is None:
+        body = await _read_body(receive)
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(len(body)),
+    }
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif key != "CONTENT_LENGTH":
+            environ[f"HTTP_{key}"] = value
+
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    result = await asyncio.to_thread(flask_app, environ, start_response)
+    chunks = iter(result)
+    try:
+        # Respostas em gerador (NDJSON, exportação) seguem pedaço a pedaço,
+        # sem bufferizar o corpo inteiro
+        chunk = await asyncio.to_thread(next, chunks, None)
+        await send({"type": "http.response.start", "status": response["status"], "headers": response["headers"]})
+        while chunk is not None:
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await asyncio.to_thread(next, chunks, None)
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        if hasattr(result, "close"):
+            await asyncio.to_thread(result.close)
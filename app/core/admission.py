@@ -0,0 +1,177 @@
+import asyncio
+import math
+import time
+from threading import Condition
+
+from config import Config
+from . import metrics
+
+class AdmissionRejected(Exception):
+    """
+    Requisição recusada pelo controle de admissão. 'status' é 429 (fila
+    cheia) ou 503 (tempo de espera esgotado); 'retry_after' em segundos.
+    """
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Limita quantas buscas rodam ao mesmo tempo no banco: um limite global
+    (ADMISSION_MAX_CONCURRENT) e um por query ("max_concurrent" no
+    queries.json). O excedente espera numa fila limitada ("max_queued" /
+    ADMISSION_MAX_QUEUE) por até "queue_timeout" / ADMISSION_QUEUE_TIMEOUT
+    segundos.
+    """
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent # 0 = sem limite global
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = Condition()
+        self._running = {}  # query_id -> buscas em execução
+        self._waiting = {}  # query_id -> buscas na fila
+        self._running_total = 0
+        self._waiting_total = 0
+        self._async_waiters = [] # (loop, asyncio.Event) de quem espera no modo ASGI
+
+    def _can_run(self, query_id, limit):
+        if self.max_concurrent and self._running_total >= self.max_concurrent:
+            return False
+        return not limit or self._running.get(query_id, 0) < limit
+
+    def _limits(self, query_obj):
+        """(query_id, limite por query, limite da fila, timeout) da query."""
+        return (query_obj.get("id"), query_obj.get("max_concurrent") or 0,
+                query_obj.get("max_queued", self.max_queue), query_obj.get("queue_timeout", self.queue_timeout))
+
+    def _enter_queue(self, query_id, queue_limit, timeout):
+        """Entra na fila (com o lock). Levanta AdmissionRejected (429) se estiver cheia."""
+        if self._waiting_total >= self.max_queue or self._waiting.get(query_id, 0) >= queue_limit:
+            metrics.registry.inc("query_tool_admission_rejections_total",
+                                 "Buscas recusadas pelo controle de admissão.",
+                                 {"query_id": query_id, "reason": "queue_full"})
+            raise AdmissionRejected(
+                "Muitas buscas simultâneas para esta consulta. Tente novamente em instantes.",
+                429, math.ceil(timeout) or 1)
+        self._waiting[query_id] = self._waiting.get(query_id, 0) + 1
+        self._waiting_total += 1
+
+    def _leave_queue(self, query_id):
+        self._waiting[query_id] -= 1
+        self._waiting_total -= 1
+
+    def _timed_out(self, query_id, timeout):
+        metrics.registry.inc("query_tool_admission_rejections_total",
+                             "Buscas recusadas pelo controle de admissão.",
+                             {"query_id": query_id, "reason": "timeout"})
+        return AdmissionRejected(
+            f"O banco está ocupado com outras buscas desta consulta "
+            f"(espera máxima de {timeout}s esgotada). Tente novamente mais tarde.",
+            503, math.ceil(timeout) or 1)
+
+    def _admit(self, query_id, start, timer):
+        """Ocupa a vaga (com o lock) e retorna a função que a libera."""
+        self._running[query_id] = self._running.get(query_id, 0) + 1
+        self._running_total += 1
+
+        waited = time.perf_counter() - start
+        timer.add("queue", waited)
+        metrics.registry.observe("query_tool_admission_wait_seconds",
+                                 "Tempo de espera na fila do controle de admissão.", {"query_id": query_id}, waited)
+
+        released = []
+
+        def release():
+            if released:
+                return
+            released.append(True)
+            with self._cond:
+                self._running[query_id] -= 1
+                self._running_total -= 1
+                self._cond.notify_all()
+                # Buscas do modo ASGI esperando no event loop
+                for loop, event in self._async_waiters:
+                    loop.call_soon_threadsafe(event.set)
+
+        return release
+
+    def acquire(self, query_obj, timer=metrics.NULL_TIMER):
+        """
+        Reserva uma vaga para a query, esperando na fila se preciso.
+        Retorna a função que libera a vaga (pode ser chamada mais de uma vez).
+        Levanta AdmissionRejected se a fila estiver cheia ou a espera esgotar.
+        """
+        query_id, limit, queue_limit, timeout = self._limits(query_obj)
+        start = time.perf_counter()
+        with self._cond:
+            if not self._can_run(query_id, limit):
+                self._enter_queue(query_id, queue_limit, timeout)
+                deadline = time.monotonic() + timeout
+                try:
+                    while not self._can_run(query_id, limit):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise self._timed_out(query_id, timeout)
+                        self._cond.wait(remaining)
+                finally:
+                    self._leave_queue(query_id)
+            return self._admit(query_id, start, timer)
+
+    async def acquire_async(self, query_obj, timer=metrics.NULL_TIMER):
+        """
+        Versão asyncio de 'acquire' (mesmos limites e a mesma fila): a espera
+        é um asyncio.Event no event loop, sem ocupar uma thread. Cancelada
+        na fila, a requisição sai dela sem reservar vaga.
+        """
+        query_id, limit, queue_limit, timeout = self._limits(query_obj)
+        start = time.perf_counter()
+        with self._cond:
+            if self._can_run(query_id, limit):
+                return self._admit(query_id, start, timer)
+            self._enter_queue(query_id, queue_limit, timeout)
+
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                with self._cond:
+                    if self._can_run(query_id, limit):
+                        return self._admit(query_id, start, timer)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timed_out(query_id, timeout)
+                    waiter[1].clear()
+                    self._async_waiters.append(waiter)
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._cond:
+                        self._async_waiters.remove(waiter)
+        finally:
+            with self._cond:
+                self._leave_queue(query_id)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self._running_total,
+                "waiting": self._waiting_total,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "by_query": {
+                    query_id: {"running": self._running.get(query_id, 0), "waiting": self._waiting.get(query_id, 0)}
+                    for query_id in set(self._running) | set(self._waiting)
+                    if self._running.get(query_id) or self._waiting.get(query_id)
+                },
+            }
+
+admission = AdmissionController(
+    max_concurrent=Config.ADMISSION_MAX_CONCURRENT,
+    max_queue=Config.ADMISSION_MAX_QUEUE,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT
+)
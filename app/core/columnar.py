@@ -0,0 +1,88 @@
+import json
+
+import oracledb
+
+# pyarrow é opcional: sem ele as queries "columnar" voltam ao modo linha a linha
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Formato das datas nas colunas serializadas (lido pelo 'new Date()' do frontend)
+JSON_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def available():
+    return pyarrow is not None
+
+def is_columnar(query_obj):
+    """A query pede o modo colunar ("fetch_mode": "columnar" no queries.json)?"""
+    return query_obj.get("fetch_mode") == "columnar"
+
+def _arrow_type(desc):
+    """Tipo Arrow de uma coluna a partir do 'cursor.description' do Oracle."""
+    type_code, precision, scale = desc[1], desc[4], desc[5]
+    if type_code is oracledb.DB_TYPE_NUMBER:
+        if scale == 0 and precision and precision <= 18:
+            return pyarrow.int64()
+        return pyarrow.float64()
+    if type_code in (oracledb.DB_TYPE_BINARY_DOUBLE, oracledb.DB_TYPE_BINARY_FLOAT):
+        return pyarrow.float64()
+    if type_code in (oracledb.DB_TYPE_DATE, oracledb.DB_TYPE_TIMESTAMP,
+                     oracledb.DB_TYPE_TIMESTAMP_TZ, oracledb.DB_TYPE_TIMESTAMP_LTZ):
+        return pyarrow.timestamp("us")
+    if type_code in (oracledb.DB_TYPE_RAW, oracledb.DB_TYPE_LONG_RAW):
+        return pyarrow.binary()
+    # ROWID, VARCHAR2, CHAR, CLOB... viram texto
+    return pyarrow.string()
+
+def arrow_schema(description):
+    return pyarrow.schema([(desc[0], _arrow_type(desc)) for desc in description])
+
+def record_batch_from_rows(schema, rows):
+    """Transpõe uma lista de tuplas do cursor em um RecordBatch."""
+    columns = list(zip(*rows)) or [[] for _ in schema]
+    arrays = []
+    for field, values in zip(schema, columns):
+        if pyarrow.types.is_string(field.type):
+            values = [None if v is None else str(v) for v in values]
+        elif pyarrow.types.is_floating(field.type):
+            values = [None if v is None else float(v) for v in values]
+        arrays.append(pyarrow.array(values, type=field.type))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+def _json_column(array):
+    """
+    Converte uma coluna Arrow em tipos nativos do JSON. Datas são formatadas
+    de forma vetorizada; decimais viram float e binários viram hexadecimal.
+    """
+    array_type = array.type
+    if pyarrow.types.is_timestamp(array_type) or pyarrow.types.is_date(array_type):
+        # Precisão de segundos (como no modo por linhas)
+        array = array.cast(pyarrow.timestamp("s"), safe=False)
+        array = pyarrow.compute.strftime(array, format=JSON_TIMESTAMP_FORMAT)
+    elif pyarrow.types.is_decimal(array_type):
+        array = array.cast(pyarrow.float64())
+    elif pyarrow.types.is_binary(array_type) or pyarrow.types.is_large_binary(array_type):
+        return [None if v is None else v.hex() for v in array.to_pylist()]
+    return array.to_pylist()
+
+def batch_columns(batch):
+    """Colunas de um RecordBatch como listas de valores nativos do JSON."""
+    return [_json_column(column) for column in batch.columns]
+
+def batch_to_json(batch, columns=None):
+    """
+    Serializa um RecordBatch como {"columns": [[valores da coluna 0], ...]},
+    coluna a coluna e sem criar um objeto Python por linha.
+    """
+    return json.dumps({"columns": columns if columns is not None else batch_columns(batch)},
+                      ensure_ascii=False, separators=(",", ":"))
+
+def columns_to_json(headers, batches):
+    """Junta os lotes em uma lista de colunas (resposta JSON de /api/buscar)."""
+    if not batches:
+        return [[] for _ in headers]
+    return [_json_column(column) for column in pyarrow.Table.from_batches(batches).columns]
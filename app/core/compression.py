@@ -0,0 +1,96 @@
+import zlib
+
+from config import Config
+
+# brotli é opcional: sem ele só o gzip é oferecido
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Só vale comprimir texto; Parquet e Arrow já são binários compactos
+COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/csv"}
+
+def choose_encoding(accept_encoding):
+    """'br' (se o pacote brotli estiver instalado) ou 'gzip', conforme o Accept-Encoding."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+class StreamCompressor:
+    """
+    Compressão incremental: cada 'chunk' sai comprimido e já decodificável
+    (flush por pedaço), para o cliente continuar recebendo o NDJSON aos poucos.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=Config.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31: formato gzip (cabeçalho + CRC)
+            self._compressor = zlib.compressobj(Config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+def compress_bytes(data, encoding):
+    compressor = StreamCompressor(encoding)
+    return compressor.chunk(data) + compressor.finish()
+
+def iter_compressed(chunks, encoding, source=None):
+    """Comprime um corpo em pedaços; fecha 'source' mesmo se o cliente desconectar."""
+    compressor = StreamCompressor(encoding)
+    try:
+        for data in chunks:
+            if data:
+                yield compressor.chunk(data)
+        yield compressor.finish()
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+
+def compress_response(response, accept_encoding):
+    """
+    Comprime uma resposta do Flask (JSON, NDJSON ou CSV) com o encoding
+    negociado. Respostas em gerador são comprimidas pedaço a pedaço.
+    """
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or "Content-Encoding" in response.headers):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = iter_compressed(response.iter_encoded(), encoding, source=response.response)
+    else:
+        data = response.get_data()
+        if len(data) < Config.COMPRESSION_MIN_BYTES:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,107 @@
+import csv
+import datetime
+import io
+
+from config import Config
+from .columnar import arrow_schema, pyarrow, record_batch_from_rows
+
+EXPORT_FORMATS = {
+    # formato -> (mimetype, extensão, precisa do pyarrow)
+    "csv": ("text/csv; charset=utf-8", "csv", False),
+    "parquet": ("application/vnd.apache.parquet", "parquet", True),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows", True),
+}
+
+def check_format(export_format):
+    """Valida o formato pedido. Levanta ValueError com a mensagem para o cliente."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação inválido: '{export_format}'. "
+                         f"Use um de: {', '.join(EXPORT_FORMATS)}.")
+    # pyarrow é opcional: sem ele só o CSV fica disponível
+    if EXPORT_FORMATS[export_format][2] and pyarrow is None:
+        raise ValueError(f"O formato '{export_format}' requer o pacote 'pyarrow' instalado no servidor.")
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    return value
+
+def iter_csv(headers, batches, counter):
+    """
+    Gera o CSV em pedaços: um pedaço de texto por lote do cursor.
+    Só o lote atual fica em memória. 'counter' recebe as linhas geradas.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=Config.EXPORT_CSV_DELIMITER, lineterminator="\r\n")
+    writer.writerow(headers)
+    # BOM para o Excel reconhecer o UTF-8
+    chunk = "\ufeff" + buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(v) for v in row] for row in batch)
+        counter["rows"] += len(batch)
+        yield chunk + buffer.getvalue()
+        chunk = ""
+    if chunk:
+        # Resultado vazio: só o cabeçalho
+        yield chunk
+
+# --- Formatos colunares (pyarrow) ---
+
+class _ChunkSink(io.RawIOBase):
+    """Arquivo de escrita que acumula os bytes até o gerador drená-los."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_columnar(export_format, description, batches, counter):
+    """
+    Gera Parquet (um row group a cada EXPORT_ROW_GROUP_SIZE linhas) ou
+    Arrow IPC stream (um record batch por lote do cursor).
+    A memória fica limitada a um row group, qualquer que seja o total de linhas.
+    """
+    schema = arrow_schema(description)
+    sink = _ChunkSink()
+    if export_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+        group_size = Config.EXPORT_ROW_GROUP_SIZE
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+        group_size = 0
+
+    pending = []
+    pending_rows = 0
+    for batch in batches:
+        pending.append(record_batch_from_rows(schema, batch))
+        pending_rows += len(batch)
+        counter["rows"] += len(batch)
+        if pending_rows >= group_size:
+            writer.write_table(pyarrow.Table.from_batches(pending, schema=schema))
+            pending = []
+            pending_rows = 0
+            yield sink.drain()
+    if pending:
+        writer.write_table(pyarrow.Table.from_batches(pending, schema=schema))
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,124 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from config import Config
+
+class JobQueueFull(Exception):
+    """A fila de jobs atingiu JOB_MAX_PENDING."""
+
+class Job:
+    """Estado de um job em segundo plano (lido por /api/jobs/<id>)."""
+
+    def __init__(self, kind, total_rows):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued" # queued -> running -> succeeded | failed
+        self.total_rows = total_rows
+        self.rows_processed = 0
+        self.batches_committed = 0
+        self.updated_count = 0
+        self.errors = []
+        self.message = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        if self.started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total_rows": self.total_rows,
+            "rows_processed": self.rows_processed,
+            "batches_committed": self.batches_committed,
+            "updated_count": self.updated_count,
+            "errors": self.errors,
+            "message": self.message,
+            "queued_seconds": round((self.started_at or time.time()) - self.created_at, 3),
+            "elapsed_seconds": round(elapsed, 3)
+        }
+
+class JobManager:
+    """
+    Pool limitado de threads para operações longas.
+    Jobs finalizados ficam consultáveis por JOB_RETENTION segundos.
+    """
+
+    def __init__(self, max_workers, max_pending, retention, enabled=True):
+        self.enabled = enabled # False = updates "async" rodam na requisição
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = Lock()
+
+    def submit(self, kind, total_rows, fn, *args, **kwargs):
+        """
+        Enfileira 'fn(*args, progress=..., **kwargs)'. 'fn' deve retornar
+        {"updated_count", "row_errors"} (contrato de 'db.execute_dynamic_update').
+        """
+        with self._lock:
+            self._purge()
+            pending = sum(1 for j in self._jobs.values() if j.status in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Fila de jobs cheia ({pending} pendentes). Tente novamente mais tarde.")
+            job = Job(kind, total_rows)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+
+        def progress(rows_processed, batches_committed):
+            job.rows_processed = rows_processed
+            job.batches_committed = batches_committed
+
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+            job.updated_count = result["updated_count"]
+            job.errors = result["row_errors"]
+            if job.errors:
+                job.status = "failed"
+                job.message = (f"{len(job.errors)} linha(s) falharam. "
+                               f"{job.batches_committed} lote(s) já haviam sido comitados.")
+            else:
+                job.status = "succeeded"
+                job.message = f"Sucesso! {job.updated_count} linhas foram atualizadas e comitadas."
+        except Exception as e:
+            print(f"Erro no job {job.id}: {e}")
+            job.status = "failed"
+            job.message = f"Erro ao atualizar: {e}"
+        finally:
+            job.finished_at = time.time()
+
+    def shutdown(self):
+        """
+        Desligamento do servidor: jobs ainda na fila são cancelados e os
+        que estão rodando terminam (cada lote comitado continua válido).
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _purge(self):
+        limit = time.time() - self.retention
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < limit]:
+            del self._jobs[job_id]
+
+job_manager = JobManager(
+    max_workers=Config.JOB_WORKERS,
+    max_pending=Config.JOB_MAX_PENDING,
+    retention=Config.JOB_RETENTION,
+    enabled=Config.JOB_ASYNC_UPDATES
+)
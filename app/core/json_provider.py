@@ -0,0 +1,65 @@
+import datetime
+import decimal
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from .columnar import JSON_TIMESTAMP_FORMAT
+
+# orjson é opcional: sem ele o encoder é o 'json' da biblioteca padrão
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value):
+    """
+    Tipos do Oracle que o JSON não conhece. Datas saem em ISO 8601 com
+    precisão de segundos (mesmo formato do modo colunar), decimais viram
+    número e binários (RAW) viram hexadecimal.
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return value.strftime(JSON_TIMESTAMP_FORMAT)
+    if isinstance(value, datetime.date):
+        return value.strftime(JSON_TIMESTAMP_FORMAT)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    raise TypeError(f"Objeto do tipo '{type(value).__name__}' não é serializável em JSON")
+
+if orjson is not None:
+    # Datas passam pelo '_default' para manter o mesmo formato sem o orjson
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """
+    JSON da aplicação (jsonify, app.json.dumps, NDJSON e hashes das linhas):
+    sempre compacto, sem ordenar chaves e com orjson quando instalado.
+    """
+
+    compact = True
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        # 'separators' é o único argumento que o jsonify passa no modo compacto
+        if orjson is not None and set(kwargs) <= {"separators"}:
+            try:
+                return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode("utf-8")
+            except orjson.JSONEncodeError:
+                # orjson só aceita inteiros de até 64 bits (um NUMBER(38) pode
+                # passar disso): o 'json' da biblioteca padrão serializa qualquer um
+                pass
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        kwargs.setdefault("separators", (",", ":"))
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
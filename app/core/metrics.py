@@ -0,0 +1,146 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from config import Config
+
+# Limites (segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Registry:
+    """
+    Métricas do processo no formato texto do Prometheus (sem dependências).
+    Histogramas e contadores indexados por tupla de labels.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._histograms = {} # nome -> (help, {labels: [contagens por bucket, soma, total]})
+        self._counters = {}   # nome -> (help, {labels: valor})
+
+    def observe(self, name, help_text, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, series = self._histograms.setdefault(name, (help_text, {}))
+            data = series.get(key)
+            if data is None:
+                data = series[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    data[0][i] += 1
+            data[1] += value
+            data[2] += 1
+
+    def inc(self, name, help_text, labels, amount=1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, series = self._counters.setdefault(name, (help_text, {}))
+            series[key] = series.get(key, 0) + amount
+
+    def render(self, gauges=()):
+        """
+        Texto do endpoint /metrics. 'gauges' = [(nome, help, {labels: valor})]
+        com valores instantâneos (pool, cache) calculados na hora.
+        """
+        lines = []
+        with self._lock:
+            for name, (help_text, series) in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {value}")
+            for name, (help_text, series) in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, (buckets, total, count) in sorted(series.items()):
+                    for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{_labels(key + (('le', repr(bound)),))} {bucket_count}")
+                    lines.append(f"{name}_bucket{_labels(key + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_labels(key)} {total}")
+                    lines.append(f"{name}_count{_labels(key)} {count}")
+        for name, help_text, series in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in series.items():
+                lines.append(f"{name}{_labels(tuple(sorted(labels)))} {value}")
+        return "\n".join(lines) + "\n"
+
+def _labels(key):
+    if not key:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+registry = Registry()
+
+class RequestTimer:
+    """
+    Mede as etapas de uma busca/update (acquire, execute, fetch, build,
+    serialize...) e, no 'finish', registra histogramas e contadores
+    rotulados por query_id. Requisições lentas vão para o slow-query log.
+    """
+
+    def __init__(self, operation, query_id):
+        self.operation = operation
+        self.query_id = query_id or "-"
+        self.stages = {}
+        self.sql = None
+        self.binds = None
+        self._started = time.perf_counter()
+        self._finished = False
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set_statement(self, sql, binds):
+        """Guarda a variante SQL efetivamente executada (para o slow log)."""
+        self.sql = sql
+        self.binds = binds
+
+    def finish(self, rows=0, response_bytes=0, error=False):
+        if self._finished:
+            return
+        self._finished = True
+        total = time.perf_counter() - self._started
+        labels = {"operation": self.operation, "query_id": self.query_id}
+
+        for stage, seconds in self.stages.items():
+            registry.observe("query_tool_stage_seconds", "Tempo por etapa da requisição.",
+                             dict(labels, stage=stage), seconds)
+        registry.observe("query_tool_request_seconds", "Tempo total da requisição.", labels, total)
+        registry.inc("query_tool_requests_total", "Requisições processadas.",
+                     dict(labels, outcome="error" if error else "ok"))
+        registry.inc("query_tool_rows_total", "Linhas lidas (busca) ou alteradas (update).", labels, rows)
+        registry.inc("query_tool_response_bytes_total", "Bytes de resposta serializados.", labels, response_bytes)
+
+        if Config.SLOW_QUERY_SECONDS and total >= Config.SLOW_QUERY_SECONDS:
+            stages = ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in self.stages.items())
+            print(f"SLOW QUERY [{self.operation}] query_id={self.query_id} total={total * 1000:.1f}ms "
+                  f"rows={rows} bytes={response_bytes} ({stages})\n"
+                  f"  SQL: {self.sql or '(resultado do cache)'}\n  BINDS: {self.binds}")
+
+class _NullTimer:
+    """Timer que não mede nada (chamadas sem instrumentação)."""
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def add(self, name, seconds):
+        pass
+
+    def set_statement(self, sql, binds):
+        pass
+
+    def finish(self, rows=0, response_bytes=0, error=False):
+        pass
+
+NULL_TIMER = _NullTimer()
@@ -1,17 +1,191 @@
+import hashlib
 import json
 import os
+import re
+import time
+from collections import namedtuple
+from contextlib import contextmanager
 from threading import Lock
 
-# Trava para evitar que duas requisições escrevam no JSON ao mesmo tempo
+from .result_cache import result_cache
+
+# Trava entre processos: fcntl no Linux/macOS, msvcrt no Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Trava para evitar que duas threads do processo gravem o catálogo ao mesmo
+# tempo (entre processos vale o LOCK_FILE)
 json_lock = Lock()
 
 QUERY_FILE = "queries.json"
 
+# --- Persistência do catálogo ---
+# O queries.json é a base. Cada edição de SQL feita pela aplicação é uma
+# única linha acrescentada ao HISTORY_FILE ({"id", "version", "sql", ...}),
+# nunca uma regravação. O catálogo em memória = base + edições do histórico
+# com versão maior que a da query na base e feitas sobre o SQL que ela tem
+# ("previous_sql_hash"): se o queries.json for editado à mão, as edições
+# antigas do histórico não se sobrepõem a ele. A cada HISTORY_COMPACT_EVERY
+# edições pendentes a base é regravada (temporário + rename) já com as
+# versões novas; o histórico continua intacto como registro das edições.
+HISTORY_FILE = "queries_history.jsonl"
+LOCK_FILE = "queries.json.lock"
+HISTORY_COMPACT_EVERY = 50
+
+class QueryVersionConflict(Exception):
+    """A query foi alterada (nova versão) desde que o editor a carregou."""
+
+@contextmanager
+def _file_lock():
+    """Trava exclusiva para gravar o catálogo, entre threads e entre processos."""
+    with json_lock:
+        with open(LOCK_FILE, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _write_atomic(path, data):
+    """Grava num temporário do mesmo diretório e troca com os.replace: quem lê vê o arquivo antigo ou o novo."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _append_history(entry):
+    """Acrescenta uma edição ao histórico com um único write em modo append."""
+    line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+    fd = os.open(HISTORY_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _read_history(offset):
+    """
+    Edições gravadas a partir do byte 'offset'. Uma linha ainda incompleta
+    (escrita em andamento) fica para a próxima leitura.
+    Retorna (edições, novo offset).
+    """
+    try:
+        with open(HISTORY_FILE, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+    end = data.rfind(b"\n") + 1
+    entries = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return entries, offset + end
+
+# --- Catálogo em memória ---
+# Snapshot imutável. A troca do snapshot é uma única atribuição, então
+# leitores nunca veem um estado parcial e não precisam de trava.
+# '_catalog_lock' só serializa recargas.
+# 'signature': (mtime, tamanho) do queries.json + tamanho do histórico;
+# 'history_offset': bytes do histórico já aplicados; 'pending': edições do
+# histórico ainda não incorporadas à base; 'history_versions': maior versão
+# gravada no histórico por query (aplicada ou não).
+_Catalog = namedtuple("_Catalog", "signature base_hash history_offset pending queries index history_versions")
+_catalog = None
+_catalog_lock = Lock()
+
+def _file_signature():
+    """Assinatura barata dos arquivos (mtime + tamanhos), sem ler o conteúdo."""
+    stat = os.stat(QUERY_FILE)
+    try:
+        history_size = os.stat(HISTORY_FILE).st_size
+    except FileNotFoundError:
+        history_size = 0
+    return (stat.st_mtime_ns, stat.st_size, history_size)
+
+def _apply_history(catalog, signature):
+    """
+    Aplica ao snapshot, na ordem em que foram gravadas, as edições do
+    histórico ainda não lidas. Uma edição só vale se continua a query como
+    ela está: versão maior (menor ou igual = já incorporada à base) e feita
+    sobre o SQL atual (senão, a base foi alterada fora da aplicação).
+    """
+    entries, offset = _read_history(catalog.history_offset)
+    changed = {}
+    history_versions = catalog.history_versions
+    if entries:
+        history_versions = dict(history_versions)
+    for entry in entries:
+        if entry["version"] > history_versions.get(entry["id"], 0):
+            history_versions[entry["id"]] = entry["version"]
+        query = changed.get(entry["id"]) or catalog.index.get(entry["id"])
+        if query is None or entry["version"] <= query.get("version", 0):
+            continue
+        previous = entry.get("previous_sql_hash")
+        if previous is not None and previous != sql_hash(query.get("sql", "")):
+            continue
+        changed[entry["id"]] = dict(query, sql=entry["sql"], version=entry["version"])
+
+    if not changed:
+        return _Catalog(signature, catalog.base_hash, offset, catalog.pending, catalog.queries, catalog.index,
+                        history_versions)
+    queries = [changed.get(q.get("id"), q) for q in catalog.queries]
+    return _Catalog(signature, catalog.base_hash, offset, catalog.pending + len(changed), queries,
+                    {q.get("id"): q for q in queries}, history_versions)
+
+def _get_catalog():
+    """
+    Retorna o snapshot atual, recarregando apenas se algum arquivo mudou.
+    Se só o histórico cresceu, lê apenas as linhas novas. Se só o mtime do
+    queries.json mudou (ex: 'touch'), o hash evita um novo parse.
+    """
+    global _catalog
+    signature = _file_signature()
+    catalog = _catalog
+    if catalog is not None and catalog.signature == signature:
+        return catalog
+
+    with _catalog_lock:
+        catalog = _catalog
+        if catalog is not None and catalog.signature == signature:
+            return catalog
+
+        # A assinatura lida ANTES do conteúdo: se um arquivo mudar durante a
+        # leitura, a próxima chamada detecta a diferença e recarrega
+        same_history = catalog is not None and signature[2] >= catalog.history_offset
+        if same_history and catalog.signature[:2] == signature[:2]:
+            catalog = _apply_history(catalog, signature)
+        else:
+            with open(QUERY_FILE, 'rb') as f:
+                raw = f.read()
+            base_hash = hashlib.sha1(raw).hexdigest()
+            if not (same_history and catalog.base_hash == base_hash):
+                # Base nova (ou histórico truncado): o histórico é relido do início
+                queries = json.loads(raw)
+                catalog = _Catalog(None, base_hash, 0, 0, queries, {q.get("id"): q for q in queries}, {})
+            catalog = _apply_history(catalog, signature)
+        _catalog = catalog
+        return catalog
+
 def get_queries_list():
     """Retorna apenas a lista de IDs e Nomes para o dropdown."""
     try:
-        with open(QUERY_FILE, 'r', encoding='utf-8') as f:
-            queries = json.load(f)
+        queries = _get_catalog().queries
         
         # Retorna uma lista simplificada
         return [{"id": q.get("id"), "name": q.get("name")} for q in queries]
@@ -22,46 +196,187 @@ def get_queries_list():
         print(f"Erro ao ler {QUERY_FILE}: {e}")
         return []
 
+def get_queries_list_full():
+    """Retorna os objetos completos de todas as queries (somente leitura)."""
+    try:
+        return _get_catalog().queries
+    except Exception as e:
+        print(f"Erro ao ler {QUERY_FILE}: {e}")
+        return []
+
+def get_query_ids_for_table(table_name):
+    """
+    IDs das queries afetadas por alterações em 'table_name': as que a têm
+    como 'target_table' ou que a citam no SQL.
+    """
+    pattern = re.compile(rf"\b{re.escape(table_name)}\b", re.IGNORECASE)
+    return [
+        q.get("id") for q in get_queries_list_full()
+        if (q.get("target_table") or "").lower() == table_name.lower() or pattern.search(q.get("sql", ""))
+    ]
+
 def get_query_by_id(query_id):
-    """Retorna o objeto completo da query selecionada."""
+    """
+    Retorna o objeto completo da query selecionada.
+    O objeto pertence ao catálogo em cache: trate-o como somente leitura.
+    """
     try:
-        with open(QUERY_FILE, 'r', encoding='utf-8') as f:
-            queries = json.load(f)
-        
-        for query in queries:
-            if query.get("id") == query_id:
-                return query
-        
-        return None # Query não encontrada
+        return _get_catalog().index.get(query_id) # None se não encontrada
     except Exception as e:
         print(f"Erro ao buscar query {query_id}: {e}")
         return None
 
-def save_query_sql(query_id, new_sql):
-    """Salva a nova string SQL no arquivo JSON."""
-    with json_lock:
+def get_missing_required_params(query_obj, params):
+    """Lista os 'bind_name' obrigatórios que vieram vazios na busca."""
+    return [p["bind_name"] for p in query_obj.get("parameters", [])
+            if p.get("required") and not params.get(p["bind_name"])]
+
+def parse_version(value):
+    """Valida a versão enviada pelo editor (inteiro >= 0). Levanta ValueError."""
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"'version' inválida: {value!r}.")
+    try:
+        version = int(value)
+    except ValueError:
+        raise ValueError(f"'version' inválida: {value!r}.")
+    if version < 0:
+        raise ValueError(f"'version' inválida: {value!r}.")
+    return version
+
+def save_query_sql(query_id, new_sql, expected_version=None):
+    """
+    Salva a nova string SQL: acrescenta a edição ao histórico com a próxima
+    versão da query. Com 'expected_version' (a versão que o editor carregou),
+    levanta QueryVersionConflict se outra edição foi salva nesse meio tempo.
+    Retorna a nova versão, ou None em caso de erro.
+    Levanta ValueError se 'expected_version' não for uma versão válida.
+    """
+    if expected_version is not None:
+        expected_version = parse_version(expected_version)
+    with _file_lock():
         try:
-            # 1. Ler o arquivo
-            with open(QUERY_FILE, 'r', encoding='utf-8') as f:
-                queries = json.load(f)
-            
-            # 2. Encontrar e modificar a query
-            query_found = False
-            for query in queries:
-                if query.get("id") == query_id:
-                    query["sql"] = new_sql
-                    query_found = True
-                    break
-            
-            if not query_found:
+            # Dentro da trava o snapshot reflete todas as gravações anteriores
+            catalog = _get_catalog()
+            query = catalog.index.get(query_id)
+            if query is None:
                 raise ValueError(f"Query ID '{query_id}' não encontrada para salvar.")
 
-            # 3. Escrever o arquivo de volta
-            with open(QUERY_FILE, 'w', encoding='utf-8') as f:
-                json.dump(queries, f, indent=2, ensure_ascii=False)
-            
-            return True
-            
+            current_version = query.get("version", 0)
+            if expected_version is not None and expected_version != current_version:
+                raise QueryVersionConflict(
+                    f"A query '{query_id}' foi alterada por outra pessoa (versão {current_version}). "
+                    f"Recarregue antes de salvar.")
+
+            # Depois de uma edição manual do queries.json a query pode voltar a
+            # uma versão menor que as do histórico: a numeração nunca se repete
+            version = max(current_version, catalog.history_versions.get(query_id, 0)) + 1
+            _append_history({
+                "id": query_id,
+                "version": version,
+                "sql": new_sql,
+                "previous_sql_hash": sql_hash(query.get("sql", "")),
+                "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+
+            # Resultados em cache da versão antiga do SQL não servem mais
+            result_cache.invalidate_queries([query_id])
+
+            if _get_catalog().pending >= HISTORY_COMPACT_EVERY:
+                _compact_catalog()
+            return version
+
+        except QueryVersionConflict:
+            raise
         except Exception as e:
             print(f"ERRO CRÍTICO ao salvar {QUERY_FILE}: {e}")
-            return False
\ No newline at end of file
+            return None
+
+def _compact_catalog():
+    """
+    Incorpora as edições pendentes ao queries.json (com o "version" de cada
+    query), numa troca atômica. Chamar com a trava do catálogo.
+    """
+    queries = _get_catalog().queries
+    raw = json.dumps(queries, indent=2, ensure_ascii=False).encode("utf-8")
+    _write_atomic(QUERY_FILE, raw)
+
+def get_query_history(query_id):
+    """Edições salvas da query, da mais antiga para a mais recente."""
+    entries, _ = _read_history(0)
+    return [entry for entry in entries if entry.get("id") == query_id]
+
+# --- Perfis de execução (EXPLAIN PLAN / estatísticas) ---
+# Guardados ao lado do queries.json, por query_id, com o hash do SQL
+# de cada perfil para comparar versões antes/depois de um 'save_query_sql'
+PROFILE_FILE = "queries_profiles.json"
+# Perfis mantidos por query (os mais antigos são descartados)
+PROFILE_HISTORY = 20
+
+_profiles_lock = Lock()
+
+def sql_hash(sql):
+    return hashlib.sha1(sql.encode("utf-8")).hexdigest()[:12]
+
+def _read_profiles():
+    try:
+        with open(PROFILE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def get_query_profiles(query_id):
+    """Perfis gravados da query, do mais antigo para o mais recente."""
+    with _profiles_lock:
+        return _read_profiles().get(query_id, [])
+
+def find_baseline(profiles, current_hash, analyze):
+    """Perfil mais recente de uma versão ANTERIOR do SQL (mesmo modo), ou None."""
+    for profile in reversed(profiles):
+        if profile.get("sql_hash") != current_hash and profile.get("analyze") == analyze:
+            return profile
+    return None
+
+def save_query_profile(query_id, query_sql, params, profile):
+    """
+    Acrescenta o perfil ao histórico da query e retorna (perfil gravado,
+    baseline da versão anterior do SQL). A escrita é atômica (arquivo
+    temporário + rename).
+    """
+    entry = dict(profile,
+                 profiled_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 sql_hash=sql_hash(query_sql),
+                 params=params)
+    with _profiles_lock:
+        profiles = _read_profiles()
+        history = profiles.get(query_id, [])
+        baseline = find_baseline(history, entry["sql_hash"], entry["analyze"])
+        history.append(entry)
+        profiles[query_id] = history[-PROFILE_HISTORY:]
+
+        tmp_path = f"{PROFILE_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(profiles, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, PROFILE_FILE)
+    return entry, baseline
+
+def compare_profiles(profile, baseline):
+    """Variação das métricas entre o baseline e o perfil atual."""
+    if not baseline:
+        return None
+
+    def metrics_of(p):
+        values = {"explain_seconds": p.get("explain_seconds"), "elapsed_seconds": p.get("elapsed_seconds")}
+        values.update(p.get("session_stats") or {})
+        return values
+
+    current, previous = metrics_of(profile), metrics_of(baseline)
+    comparison = {}
+    for name, value in current.items():
+        old = previous.get(name)
+        if value is None or old is None:
+            continue
+        change = round((value - old) / old * 100, 1) if old else None
+        comparison[name] = {"baseline": old, "current": value, "change_pct": change}
+    return {"baseline_sql_hash": baseline.get("sql_hash"),
+            "baseline_profiled_at": baseline.get("profiled_at"),
+            "metrics": comparison}
@@ -0,0 +1,147 @@
+import hashlib
+import sys
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from config import Config
+
+class ResultCache:
+    """
+    Cache LRU + TTL dos resultados de /api/buscar, limitado por memória.
+
+    Chave: (query_id, versão do SQL, parâmetros normalizados, página).
+    As entradas de uma query são descartadas quando o SQL é salvo ou quando
+    um UPDATE é comitado na tabela que ela lê (ver 'invalidate_queries').
+    """
+
+    def __init__(self, ttl, max_bytes, max_entries):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # chave -> (expira_em, tamanho, valor)
+        self._bytes = 0
+        self._lock = Lock()
+        # Incrementado a cada invalidação: uma busca iniciada antes de um
+        # UPDATE não pode gravar no cache um resultado já desatualizado
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query_id, sql, params, page_size=None, offset=0, columnar=False, compact=False, max_rows=None):
+        sql_version = hashlib.sha1(sql.encode("utf-8")).hexdigest()
+        # Valores vazios = filtro não informado (mesma regra do template)
+        normalized = tuple(sorted((k, str(v)) for k, v in params.items() if v))
+        # Os modos linha/colunar/compacto guardam formatos diferentes do mesmo resultado
+        # O teto de linhas muda o conteúdo (e o 'truncated') do resultado
+        return (query_id, sql_version, normalized, page_size, offset, columnar, compact, max_rows)
+
+    @property
+    def generation(self):
+        return self._generation
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, generation):
+        """Guarda o resultado, a menos que houve invalidação desde 'generation'."""
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_queries(self, query_ids):
+        query_ids = set(query_ids)
+        with self._lock:
+            self._generation += 1
+            for key in [k for k in self._entries if k[0] in query_ids]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+def _estimate_size(result, sample=50):
+    """
+    Estimativa barata (por amostragem) da memória de um resultado
+    {"headers": [...], "rows": [{...} ou [...], ...]} ou {"headers", "columns": [[...], ...]}.
+    """
+    if "columns" in result:
+        total = sys.getsizeof(result)
+        for column in result["columns"]:
+            sampled = column[:sample]
+            if sampled:
+                per_value = sum(sys.getsizeof(v) for v in sampled) / len(sampled)
+                total += int(per_value * len(column))
+            total += sys.getsizeof(column)
+        return total
+    rows = result.get("rows") or []
+    if not rows:
+        return sys.getsizeof(result)
+    sampled = rows[:sample]
+    per_row = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(v) for v in (row.values() if isinstance(row, dict) else row))
+        for row in sampled
+    ) / len(sampled)
+    return int(per_row * len(rows)) + sys.getsizeof(rows)
+
+result_cache = ResultCache(
+    ttl=Config.RESULT_CACHE_TTL,
+    max_bytes=Config.RESULT_CACHE_MAX_MB * 1024 * 1024,
+    max_entries=Config.RESULT_CACHE_MAX_ENTRIES
+)
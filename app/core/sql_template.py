@@ -0,0 +1,179 @@
+import re
+from functools import lru_cache
+from threading import Lock
+
+# Trechos onde ":nome" NÃO é bind: literais, identificadores entre aspas e comentários
+_NON_CODE = re.compile(r"'(?:[^']|'')*'|\"[^\"]*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_BIND = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+# Predicado simples sobre um bind: "<coluna> <op> <operando>", com o bind no
+# operando da direita (inteiro, inclusive concatenações e contas)
+# Ex: "e.equ_num_serie = :ccit_ext", "a.data = TO_DATE(:data, 'DD/MM/YYYY')",
+#     "a.nome LIKE :nome || '%'"
+_TERM = r"(?:'(?:[^']|'')*'|:\w+|\w+\(\s*[^()]*\)|[A-Za-z_][\w$#.]*|\d+(?:\.\d+)?)"
+_PREDICATE = (
+    r"(?:\w+\(\s*)?(?:[A-Za-z_][\w$#]*\.)?(?:[A-Za-z_][\w$#]*|\"[^\"]+\")(?:\s*\))?"
+    r"\s*(?:=|<>|!=|>=|<=|>|<|\bNOT\s+LIKE\b|\bLIKE\b)\s*"
+    rf"{_TERM}(?:\s*(?:\|\||[-+*/])\s*{_TERM})*"
+)
+_PREDICATE_RE = re.compile(_PREDICATE, re.IGNORECASE)
+# O predicado só vira "1=1" entre ANDs: antes dele WHERE/AND/ON/HAVING/"(",
+# depois AND, ")", o fim da query ou a próxima cláusula. Com OR ou NOT ao
+# lado, "1=1" mudaria o sentido da condição.
+_BEFORE_PREDICATE = re.compile(r"(?:\b(?:WHERE|AND|ON|HAVING)|\()\s*$", re.IGNORECASE)
+_AFTER_PREDICATE = re.compile(
+    r"\s*(?:$|;|\)|\b(?:AND|WHERE|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|NATURAL|ORDER|GROUP|HAVING"
+    r"|UNION|INTERSECT|MINUS|FETCH|OFFSET|FOR|CONNECT|START)\b)",
+    re.IGNORECASE
+)
+# Funções que já tratam o bind NULL (ex: "col = NVL(:p, col)"): o predicado
+# fica no texto e o bind vai como NULL, como a query foi escrita
+_NULL_HANDLING = r"\b(?:NVL2?|COALESCE|DECODE|NULLIF)\s*\([^()]*"
+
+class QueryTemplate:
+    """
+    SQL do catálogo analisado uma única vez.
+
+    Conhece os binds da query e os predicados que eles controlam.
+    Quando os filtros opcionais de um predicado não são informados (todos,
+    se ele usa mais de um bind), o predicado vira "1=1".
+    Fora de uma cadeia de ANDs (ex: ao lado de um OR) o predicado fica no
+    texto e o bind recebe NULL, ou seja, aquela alternativa não casa.
+    Cada combinação de filtros informados (máscara) gera um texto SQL fixo,
+    memoizado, para que o Oracle reaproveite o cursor compartilhado em vez
+    de fazer hard parse a cada busca.
+    """
+
+    def __init__(self, sql):
+        self.sql = sql
+        code_spans = self._code_spans(sql)
+        self.bind_names = self._find_binds(sql, code_spans)
+        # (início, fim) do predicado -> binds que ele usa
+        self.predicates = {}
+        fixed = set()
+        for name in self.bind_names:
+            spans = self._find_predicates(sql, code_spans, name)
+            # Só é removível se TODAS as ocorrências do bind estão em predicados simples
+            if spans and len(spans) == self._count_occurrences(sql, code_spans, name):
+                for span in spans:
+                    self.predicates.setdefault(span, set()).add(name)
+            else:
+                fixed.update(spans)
+        # Predicado com um bind que aparece em outro lugar nunca sai do texto
+        for span in fixed:
+            self.predicates.pop(span, None)
+        # Binds que, vazios, vão como NULL sem a query ter previsto isso
+        controlled = set().union(*self.predicates.values())
+        self._null_binds = [
+            name for name in self.bind_names
+            if name not in controlled and not self._null_handled(name).search(sql)
+        ]
+        self._variants = {}
+        self._variants_lock = Lock()
+
+    @staticmethod
+    def _code_spans(sql):
+        """Intervalos do SQL fora de literais e comentários."""
+        spans, pos = [], 0
+        for m in _NON_CODE.finditer(sql):
+            spans.append((pos, m.start()))
+            pos = m.end()
+        spans.append((pos, len(sql)))
+        return spans
+
+    @staticmethod
+    def _in_code(code_spans, pos):
+        return any(a <= pos < b for a, b in code_spans)
+
+    @classmethod
+    def _find_binds(cls, sql, code_spans):
+        names = []
+        for a, b in code_spans:
+            for m in _BIND.finditer(sql, a, b):
+                if m.group(1) not in names:
+                    names.append(m.group(1))
+        return names
+
+    @staticmethod
+    def _count_occurrences(sql, code_spans, name):
+        pattern = re.compile(rf"(?<![:\w]):{name}\b")
+        return sum(len(pattern.findall(sql, a, b)) for a, b in code_spans)
+
+    @classmethod
+    def _find_predicates(cls, sql, code_spans, name):
+        bind = re.compile(rf"(?<![:\w]):{re.escape(name)}\b")
+        null_handled = cls._null_handled(name)
+        return [
+            m.span() for m in _PREDICATE_RE.finditer(sql)
+            if cls._in_code(code_spans, m.start()) and bind.search(m.group())
+            and not null_handled.search(m.group())
+            and cls._between_ands(sql, *m.span())
+        ]
+
+    @staticmethod
+    def _null_handled(name):
+        """Bind dentro de NVL/COALESCE/DECODE/NULLIF."""
+        return re.compile(rf"{_NULL_HANDLING}(?<![:\w]):{re.escape(name)}\b", re.IGNORECASE)
+
+    @staticmethod
+    def _between_ands(sql, start, end):
+        """O predicado é um termo de uma cadeia de ANDs (ver _BEFORE_PREDICATE)?"""
+        # "(pred)" vale pelo contexto dos parênteses
+        while sql[:start].rstrip().endswith("(") and sql[end:].lstrip().startswith(")"):
+            start = sql[:start].rstrip().rindex("(")
+            end = len(sql) - len(sql[end:].lstrip()) + 1
+        return bool(_BEFORE_PREDICATE.search(sql, 0, start)) and bool(_AFTER_PREDICATE.match(sql, end))
+
+    def variant(self, present):
+        """
+        Retorna (sql, binds_usados) para o conjunto de binds informados.
+        Predicados cujos binds estão todos ausentes somem do SQL; os binds
+        ausentes que continuam no texto recebem NULL.
+        """
+        mask = frozenset(name for name in self.bind_names if name in present)
+        cached = self._variants.get(mask)
+        if cached is not None:
+            return cached
+
+        with self._variants_lock:
+            cached = self._variants.get(mask)
+            if cached is not None:
+                return cached
+
+            removed = sorted(
+                (span for span, names in self.predicates.items() if not names & mask),
+                reverse=True
+            )
+            sql = self.sql
+            for start, end in removed:
+                sql = sql[:start] + "1=1" + sql[end:]
+
+            used = tuple(self._find_binds(sql, self._code_spans(sql)))
+            for name in used:
+                if name not in mask and name in self._null_binds:
+                    print(f"AVISO: o bind ':{name}' não está em um predicado simples; vazio, será enviado como NULL.")
+            cached = (sql, used)
+            self._variants[mask] = cached
+            return cached
+
+    def render(self, bind_params):
+        """
+        Aplica os parâmetros da busca (valores vazios = filtro não informado)
+        e retorna (sql, binds) prontos para o cursor.
+        """
+        present = {k: v for k, v in bind_params.items() if v}
+        sql, used = self.variant(present)
+        return sql, {name: present.get(name) for name in used}
+
+    def variant_count(self, required=()):
+        """
+        Quantidade máxima de textos SQL distintos que este template gera.
+        Binds obrigatórios ('required') estão sempre presentes: não contam.
+        """
+        optional = set().union(*self.predicates.values()) - set(required)
+        return 2 ** len(optional)
+
+@lru_cache(maxsize=256)
+def get_template(sql):
+    """Compila (uma vez por texto SQL) e retorna o template da query."""
+    return QueryTemplate(sql)
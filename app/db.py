@@ -1,105 +1,767 @@
+import base64
+import json
+import re
+import time
+import uuid
 import oracledb
+from threading import Lock
 from config import Config
+from .core import columnar, metrics, query_manager, sql_template
 
-# --- Bloco PL/SQL Genérico ---
-plsql_set_role = """
-declare 
-    v_setrole varchar2(50);
-    comando varchar2(200);
-begin
-    select cbd_use_role into v_setrole from CONTROLE_BD;
-    comando := 'SET ROLE ' || v_setrole || ' IDENTIFIED BY "Zp*/3i2~"';
-    EXECUTE IMMEDIATE comando;
-end;
-"""
+# --- Pool de Sessões (único por processo) ---
+_pool = None
+_pool_lock = Lock()
+
+def _build_set_role_plsql():
+    """Constrói o bloco PL/SQL que ativa a ROLE usando a senha do Config."""
+    # Verifica se a senha da ROLE foi carregada
+    if not Config.DB_ROLE_PASSWORD:
+        raise ValueError("DB_ROLE_PASSWORD não está definida no .env")
+
+    # A senha NUNCA fica visível no código-fonte
+    # (Note o uso de f-string e as aspas duplas dentro da string de comando)
+    return f"""
+    declare 
+        v_setrole varchar2(50);
+        comando varchar2(200);
+    begin
+        select cbd_use_role into v_setrole from CONTROLE_BD;
+        comando := 'SET ROLE ' || v_setrole || ' IDENTIFIED BY "{Config.DB_ROLE_PASSWORD}"';
+        EXECUTE IMMEDIATE comando;
+    end;
+    """
+
+def _init_session(connection, requested_tag):
+    """
+    Callback do pool: chamado apenas quando uma sessão NOVA é criada.
+    A ROLE fica ativa durante toda a vida da sessão, então sessões
+    reaproveitadas do pool não repetem o round-trip do SET ROLE.
+    """
+    start = time.perf_counter()
+    cursor = connection.cursor()
+    cursor.execute(_build_set_role_plsql())
+    cursor.close()
+    metrics.registry.observe("query_tool_role_activation_seconds",
+                             "Tempo do SET ROLE em sessões novas do pool.", {},
+                             time.perf_counter() - start)
+
+def get_pool():
+    """Cria (na primeira chamada) e retorna o pool de sessões do processo."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Falha cedo se a senha da ROLE não estiver configurada
+                _build_set_role_plsql()
+                _pool = oracledb.create_pool(
+                    user=Config.DB_USER,
+                    password=Config.DB_PASSWORD,
+                    dsn=Config.DB_DSN,
+                    min=Config.DB_POOL_MIN,
+                    max=Config.DB_POOL_MAX,
+                    increment=Config.DB_POOL_INCREMENT,
+                    session_callback=_init_session,
+                    ping_interval=Config.DB_POOL_PING_INTERVAL,
+                    getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+                    wait_timeout=Config.DB_POOL_WAIT_TIMEOUT * 1000,
+                    stmtcachesize=Config.DB_STMT_CACHE_SIZE or _default_stmt_cache_size()
+                )
+    return _pool
+
+def close_pool():
+    """Fecha o pool do processo (ex: no desligamento do servidor)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close(force=True)
+            _pool = None
 
-def get_db_connection():
-    """Cria, configura a ROLE e retorna uma conexão."""
+def get_pool_stats():
+    """Retorna as estatísticas do pool para monitoramento."""
+    if _pool is None:
+        return {"initialized": False}
+    return {
+        "initialized": True,
+        "min": _pool.min,
+        "max": _pool.max,
+        "increment": _pool.increment,
+        "opened": _pool.opened,
+        "busy": _pool.busy,
+        "available": _pool.opened - _pool.busy,
+        "ping_interval": _pool.ping_interval,
+        "stmtcachesize": _pool.stmtcachesize,
+        "wait_timeout_ms": _pool.wait_timeout
+    }
+
+def get_db_connection(timer=metrics.NULL_TIMER):
+    """
+    Retorna uma sessão do pool, já com a ROLE ativa.
+    Sessões ociosas há mais de DB_POOL_PING_INTERVAL segundos são verificadas
+    antes da entrega. O 'connection.close()' devolve a sessão ao pool.
+    """
     try:
-        connection = oracledb.connect(
-            user=Config.DB_USER,
-            password=Config.DB_PASSWORD,
-            dsn=Config.DB_DSN
-        )
-        
-        # Verifica se a senha da ROLE foi carregada
-        if not Config.DB_ROLE_PASSWORD:
-            raise ValueError("DB_ROLE_PASSWORD não está definida no .env")
-
-        # 2. Constrói o bloco PL/SQL dinamicamente usando a senha do Config
-        # A senha NUNCA fica visível no código-fonte
-        # (Note o uso de f-string e as aspas duplas dentro da string de comando)
-        plsql_set_role = f"""
-        declare 
-            v_setrole varchar2(50);
-            comando varchar2(200);
-        begin
-            select cbd_use_role into v_setrole from CONTROLE_BD;
-            comando := 'SET ROLE ' || v_setrole || ' IDENTIFIED BY "{Config.DB_ROLE_PASSWORD}"';
-            EXECUTE IMMEDIATE comando;
-        end;
-        """
-
-        # 3. Executa o bloco PL/SQL para definir a ROLE
-        cursor = connection.cursor()
-        cursor.execute(plsql_set_role)
-        cursor.close()
-        
-        return connection
-        
+        with timer.stage("acquire"):
+            return get_pool().acquire()
     except oracledb.Error as e:
         print(f"Erro ao conectar ou definir ROLE: {e}")
         raise
 
-def execute_dynamic_query(sql, bind_params):
-    """Executa uma query de SELECT dinâmica."""
-    
-    # Filtra parâmetros vazios (para campos opcionais)
-    final_bind_params = {k: v for k, v in bind_params.items() if v}
+def _prepare_query(sql, bind_params):
+    """
+    Aplica os parâmetros opcionais via template compilado e retorna (sql, binds).
+    O texto SQL só varia por combinação de filtros informados (não por valor).
+    """
+    return sql_template.get_template(sql).render(bind_params)
+
+# Teto do cache calculado: cada statement em cache é um cursor aberto na
+# sessão, e o OPEN_CURSORS padrão do Oracle é 300
+_MAX_STMT_CACHE_SIZE = 200
+
+def _default_stmt_cache_size():
+    """
+    Dimensiona o cache de statements do driver para caber todas as variantes
+    do catálogo (com e sem paginação), mais UPDATEs e o bloco da ROLE.
+    Só os filtros opcionais geram variantes; o total é limitado a
+    _MAX_STMT_CACHE_SIZE (DB_STMT_CACHE_SIZE define outro valor).
+    """
+    variants = sum(
+        sql_template.get_template(q["sql"]).variant_count(
+            p["bind_name"] for p in q.get("parameters", []) if p.get("required")
+        )
+        for q in query_manager.get_queries_list_full()
+    )
+    return min(max(20, variants * 2 + 10), _MAX_STMT_CACHE_SIZE)
+
+# --- Ajuste de fetch por query ---
+# Chaves opcionais do queries.json que ajustam o cursor de cada query
+FETCH_OPTION_KEYS = ("arraysize", "prefetch_rows", "expected_rows")
+
+def query_fetch_options(query_obj):
+    """
+    Lê o ajuste de fetch da query no queries.json: "arraysize" (linhas por
+    round-trip), "prefetch_rows" (linhas que já vêm no execute) e
+    "expected_rows" (tamanho típico do resultado). Todos opcionais.
+    """
+    options = {}
+    for key in FETCH_OPTION_KEYS:
+        value = query_obj.get(key)
+        if value:
+            value = int(value)
+            if value <= 0:
+                raise ValueError(f"'{key}' da query '{query_obj.get('id')}' deve ser maior que zero.")
+            options[key] = value
+    return options
+
+def _fetch_sizes(fetch_options, page_size=None, max_rows=None):
+    """
+    Retorna (arraysize, prefetchrows) do cursor. Paginado, a página inteira
+    (+1 linha de sobra) vem num round-trip. Sem paginação vale o "arraysize"
+    da query; senão, com "expected_rows", um lote do tamanho do resultado
+    esperado (+1, para o fim do cursor chegar no mesmo round-trip); senão
+    DB_FETCH_ARRAYSIZE. Nunca passa de DB_FETCH_MAX_ARRAYSIZE nem do teto
+    "max_rows" (+1). O prefetch é o "prefetch_rows" da query ou o arraysize.
+    """
+    fetch_options = fetch_options or {}
+    if page_size:
+        arraysize = page_size + 1
+    elif "arraysize" in fetch_options:
+        arraysize = fetch_options["arraysize"]
+    elif "expected_rows" in fetch_options:
+        arraysize = fetch_options["expected_rows"] + 1
+    else:
+        arraysize = Config.DB_FETCH_ARRAYSIZE
+    arraysize = min(arraysize, Config.DB_FETCH_MAX_ARRAYSIZE)
+    if max_rows:
+        arraysize = min(arraysize, max_rows + 1)
+    prefetch_rows = min(fetch_options.get("prefetch_rows", arraysize), Config.DB_FETCH_MAX_ARRAYSIZE)
+    return arraysize, prefetch_rows
+
+# Acima disso um double perde dígitos: a coluna segue com a conversão padrão
+_MAX_DOUBLE_PRECISION = 15
+
+def _json_timestamp(value):
+    """Data no mesmo formato do JSON (columnar.JSON_TIMESTAMP_FORMAT)."""
+    return value.strftime(columnar.JSON_TIMESTAMP_FORMAT)
+
+def json_output_type_handler(cursor, metadata):
+    """
+    Output type handler das buscas que viram JSON: os valores saem do fetch
+    já no tipo que será serializado. NUMBER com casas decimais (até 15
+    dígitos) vem como BINARY_DOUBLE (float, nunca Decimal, qualquer que seja
+    o 'defaults.fetch_decimals'); DATE e TIMESTAMP viram texto ISO 8601 no
+    próprio fetch. Vale só para o cursor: o NLS das sessões não muda.
+    """
+    if metadata.type_code is oracledb.DB_TYPE_NUMBER:
+        if (metadata.scale or 0) > 0 and 0 < (metadata.precision or 0) <= _MAX_DOUBLE_PRECISION:
+            return cursor.var(oracledb.DB_TYPE_BINARY_DOUBLE, arraysize=cursor.arraysize)
+    elif metadata.type_code in (oracledb.DB_TYPE_DATE, oracledb.DB_TYPE_TIMESTAMP):
+        return cursor.var(metadata.type_code, arraysize=cursor.arraysize, outconverter=_json_timestamp)
+    return None
+
+def _paginate_query(sql, bind_params, page_size, offset, max_rows=None):
+    """
+    Aplica OFFSET/FETCH à query já ordenada ('_stable_order'). Busca uma linha
+    a mais que 'page_size' para saber se existe próxima página sem um
+    COUNT(*) extra; com teto ('max_rows') a página para nele, e a linha a
+    mais indica o corte (ver '_take_rows').
+    O texto SQL não muda entre páginas (offset e limite são binds).
+    """
+    fetch = page_size if not max_rows else max(min(page_size, max_rows - offset), 0)
+    paged_sql = f"{sql}\nOFFSET :p_offset ROWS FETCH NEXT :p_fetch ROWS ONLY"
+    paged_binds = dict(bind_params, p_offset=offset, p_fetch=fetch + 1)
+    return paged_sql, paged_binds
+
+def _cap_query(sql, bind_params, max_rows):
+    """
+    Teto de linhas da query ("max_rows") sem paginação: FETCH FIRST com uma
+    linha a mais para saber se o resultado foi cortado.
+    """
+    capped_sql = f"SELECT * FROM (\n{sql}\n) FETCH FIRST :p_max_rows ROWS ONLY"
+    capped_binds = dict(bind_params, p_max_rows=max_rows + 1)
+    return capped_sql, capped_binds
+
+def _limit_query(sql, bind_params, page_size, offset, max_rows):
+    """
+    Aplica o teto ("max_rows") e a paginação. Paginar exige uma ordem
+    estável: ver '_stable_order'.
+    Retorna (sql, binds, alias_adicionado), como '_rowid_filter_query'.
+    """
+    if page_size:
+        sql, bind_params = _paginate_query(_stable_order(sql), bind_params, page_size, offset, max_rows)
+    elif max_rows:
+        sql, bind_params = _cap_query(sql, bind_params, max_rows)
+    return sql, bind_params, False
+
+def query_max_rows(query_obj):
+    """Teto de linhas da query: "max_rows" do queries.json ou SEARCH_MAX_ROWS (0/None = sem teto)."""
+    max_rows = query_obj.get("max_rows", Config.SEARCH_MAX_ROWS)
+    return int(max_rows) if max_rows else None
+
+def _take_rows(available, row_count, page_size, offset, max_rows):
+    """
+    Quantas das 'available' linhas lidas agora entram no resultado, dado o
+    que já foi lido ('row_count'). Retorna (quantidade, has_more, truncated):
+    a linha de sobra indica próxima página ou, se o teto vem antes, o corte.
+    """
+    page_left = page_size - row_count if page_size else None
+    cap_left = max_rows - offset - row_count if max_rows else None
+    if cap_left is not None and (page_left is None or cap_left <= page_left):
+        if available > cap_left:
+            return max(cap_left, 0), False, True
+    elif page_left is not None and available > page_left:
+        return page_left, True, False
+    return available, False, False
+
+def normalize_page_size(page_size):
+    """Valida o 'page_size' da requisição (None = sem paginação)."""
+    if page_size in (None, ""):
+        return None
+    page_size = int(page_size)
+    if page_size <= 0:
+        raise ValueError("'page_size' deve ser maior que zero.")
+    return min(page_size, Config.SEARCH_MAX_PAGE_SIZE)
+
+# Formatos das linhas na resposta JSON de /api/buscar
+# ('objects' = um dicionário por linha; 'compact' = cabeçalhos uma vez e linhas como arrays)
+ROW_FORMATS = ("objects", "compact")
+
+def normalize_row_format(row_format):
+    """Valida o 'format' da requisição (padrão: 'objects')."""
+    if row_format in (None, ""):
+        return "objects"
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"'format' inválido: {row_format}. Use: {', '.join(ROW_FORMATS)}.")
+    return row_format
+
+def encode_page_cursor(offset):
+    """Gera o token opaco da próxima página."""
+    raw = json.dumps({"offset": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_page_cursor(token):
+    """Lê o token de página. Token ausente = primeira página."""
+    if not token:
+        return 0
+    try:
+        offset = int(json.loads(base64.urlsafe_b64decode(token.encode("ascii")))["offset"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Cursor de paginação inválido: {e}")
+    if offset < 0:
+        raise ValueError("Cursor de paginação inválido: offset negativo.")
+    return offset
+
+# --- Refresh por ROWID ---
+# ROWIDs por round-trip no refresh: a lista IN tem sempre este tamanho, então
+# o texto SQL é o mesmo em toda chamada (aproveita o cache de statements)
+REFRESH_CHUNK_SIZE = 500
+_ROWID_ALIAS = "P_REFRESH_ROWID"
+_ROWID_COLUMN_RE = re.compile(r"(?<![\w.\"])(?:\w+\.)?rowid\b", re.IGNORECASE)
+_COLUMN_ALIAS_RE = re.compile(r'\s*(?:AS\s+)?("[^"]+"|\w+)', re.IGNORECASE)
+_STAR_COLUMN_RE = re.compile(r"\s*(?:\w+\.)?\*\s*")
+# Literais, identificadores entre aspas e comentários são consumidos inteiros:
+# o que está dentro deles (ou de parênteses) não conta como nível 0
+_TOP_LEVEL_RE = re.compile(
+    r"'(?:[^']|'')*'|\"[^\"]*\"|--[^\n]*|/\*.*?\*/|[(),]"
+    r"|\b(?:SELECT|FROM|JOIN|WHERE|GROUP\s+BY|HAVING|ORDER\s+BY)\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+def _query_shape(sql):
+    """
+    Lê o nível 0 da query (fora de subqueries e funções). Retorna os trechos
+    (início, fim) de cada coluna do primeiro SELECT, se o FROM tem join e
+    onde começa o ORDER BY final (None se não há).
+    """
+    columns, joined, order_start = [], False, None
+    depth, section, column_start = 0, None, None
+    for match in _TOP_LEVEL_RE.finditer(sql):
+        token = " ".join(match.group(0).upper().split())
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth or token[0] in "'\"-/":
+            continue
+        elif token == "SELECT" and section is None:
+            section, column_start = "select", match.end()
+        elif section == "select" and token in (",", "FROM"):
+            columns.append((column_start, match.start()))
+            column_start = match.end()
+            if token == "FROM":
+                section = "from"
+        elif section == "from" and token in (",", "JOIN"):
+            joined = True
+        elif token in ("WHERE", "GROUP BY", "HAVING"):
+            section = "filter"
+        elif token == "ORDER BY":
+            order_start = match.start()
+    return columns, joined, order_start
+
+def _find_rowid(sql, columns):
+    """Acha o ROWID ('x.rowid' ou 'ROWID') entre as colunas do SELECT."""
+    select_end = columns[-1][1] if columns else len(sql)
+    match = _ROWID_COLUMN_RE.search(sql, 0, select_end)
+    if not match:
+        raise ValueError("A query não seleciona o ROWID (ex: 'a.rowid' como primeira coluna).")
+    return match
+
+def _stable_order(sql):
+    """
+    Ordem estável para paginar. Vale o ORDER BY da própria query; o ROWID
+    selecionado entra só como desempate. Num join o mesmo ROWID pode se
+    repetir (uma linha por item do estoque, por ex.), então as demais colunas
+    também desempatam, pela posição no SELECT (com '*' o número de colunas é
+    desconhecido e fica só o ROWID).
+    """
+    columns, joined, order_start = _query_shape(sql)
+    rowid = _find_rowid(sql, columns)
+    tie_breakers = [rowid.group(0)]
+    if joined and not any(_STAR_COLUMN_RE.fullmatch(sql, start, end) for start, end in columns):
+        tie_breakers += [
+            str(position) for position, (start, end) in enumerate(columns, 1)
+            if not start <= rowid.start() < end
+        ]
+    order_clause = ", " if order_start is not None else "ORDER BY "
+    return f"{sql}\n{order_clause}{', '.join(tie_breakers)}"
+
+def _rowid_column(sql):
+    """
+    Acha a coluna do ROWID no SELECT para usá-la fora da query. Ela recebe
+    um alias, pois 'ROWID' fora de uma view inline seria o pseudo-ROWID da
+    própria view, não o da tabela. Retorna (sql, coluna, alias_adicionado).
+    """
+    match = _find_rowid(sql, _query_shape(sql)[0])
+
+    alias = _COLUMN_ALIAS_RE.match(sql, match.end())
+    if alias and alias.group(1).upper() != "FROM":
+        rowid_column = alias.group(1)
+        added_alias = False
+    else:
+        sql = f"{sql[:match.end()]} AS {_ROWID_ALIAS}{sql[match.end():]}"
+        rowid_column = _ROWID_ALIAS
+        added_alias = True
+    return sql, rowid_column, added_alias
+
+def restore_rowid_headers(headers):
+    """Troca o alias adicionado por '_rowid_column' pelo nome 'ROWID'."""
+    return ["ROWID" if h == _ROWID_ALIAS else h for h in headers]
+
+def _rowid_filter_query(sql, bind_params, rowids):
+    """
+    Restringe a query às linhas de 'rowids' (no máximo REFRESH_CHUNK_SIZE).
+    Retorna (sql, binds, alias_adicionado).
+    """
+    if not rowids or len(rowids) > REFRESH_CHUNK_SIZE:
+        raise ValueError(f"Informe de 1 a {REFRESH_CHUNK_SIZE} ROWIDs por lote.")
+    sql, rowid_column, added_alias = _rowid_column(sql)
+
+    # Completa a lista repetindo o último ROWID (não duplica linhas no IN)
+    padded = list(rowids) + [rowids[-1]] * (REFRESH_CHUNK_SIZE - len(rowids))
+    in_list = ", ".join(f":p_rid_{i}" for i in range(REFRESH_CHUNK_SIZE))
+    filtered_sql = f"SELECT * FROM (\n{sql}\n) WHERE {rowid_column} IN ({in_list})"
+    filtered_binds = dict(bind_params, **{f"p_rid_{i}": rowid for i, rowid in enumerate(padded)})
+    return filtered_sql, filtered_binds, added_alias
+
+class QueryStream:
+    """
+    Resultado de SELECT lido do cursor em lotes, sem materializar tudo.
+    Mantém a sessão do pool até 'close()' (chamado ao fim de 'batches()').
+
+    Com 'rowids' lê só essas linhas (refresh), no lugar da paginação.
+    Com 'connection' usa essa sessão (ex: a transação de um UPDATE ainda
+    não comitado) e não a devolve ao pool no 'close()'.
+    Com 'max_rows' lê no máximo essa quantidade de linhas (somando as
+    páginas); 'truncated' indica que o resultado foi cortado pelo teto.
+    'fetch_options' (ver query_fetch_options) ajusta arraysize/prefetch e
+    'json_types' liga o json_output_type_handler.
+
+    Atributos: headers, description, row_count, has_more, truncated, next_offset.
+    """
+
+    def __init__(self, sql, bind_params, page_size=None, offset=0, timer=metrics.NULL_TIMER, rowids=None,
+                 connection=None, max_rows=None, fetch_options=None, json_types=False):
+        self.page_size = page_size
+        self.offset = offset
+        # O refresh por ROWID relê linhas já exibidas: sem teto
+        self.max_rows = max_rows if rowids is None else None
+        self.row_count = 0
+        self.has_more = False
+        self.truncated = False
+        self.connection = None
+        self.cursor = None
+        self._owns_connection = connection is None
+        self.json_types = json_types
+        self.timer = timer
+
+        added_alias = False
+        with timer.stage("prepare"):
+            sql, final_bind_params = _prepare_query(sql, bind_params)
+            if rowids is not None:
+                sql, final_bind_params, added_alias = _rowid_filter_query(sql, final_bind_params, rowids)
+                arraysize = prefetch_rows = REFRESH_CHUNK_SIZE
+            else:
+                sql, final_bind_params, added_alias = _limit_query(sql, final_bind_params, page_size, offset,
+                                                                   self.max_rows)
+                arraysize, prefetch_rows = _fetch_sizes(fetch_options, page_size, self.max_rows)
+        timer.set_statement(sql, final_bind_params)
+
+        try:
+            self.connection = get_db_connection(timer) if connection is None else connection
+            self._execute(sql, final_bind_params, arraysize, prefetch_rows)
+            if added_alias:
+                self._restore_rowid_header()
+        except oracledb.Error as e:
+            print(f"Erro ao executar query dinâmica: {e}")
+            self.close()
+            raise
+
+    def _execute(self, sql, bind_params, arraysize, prefetch_rows):
+        self.cursor = self.connection.cursor()
+        self.cursor.arraysize = arraysize
+        self.cursor.prefetchrows = prefetch_rows
+        if self.json_types:
+            self.cursor.outputtypehandler = json_output_type_handler
+        with self.timer.stage("execute"):
+            self.cursor.execute(sql, bind_params)
+        self.description = self.cursor.description
+        self.headers = [desc[0] for desc in self.description]
+
+    def _restore_rowid_header(self):
+        """O alias do ROWID adicionado pela query volta a ser o nome 'ROWID'."""
+        self.headers = restore_rowid_headers(self.headers)
+
+    @property
+    def next_offset(self):
+        return self.offset + self.row_count if self.has_more else None
+
+    def _take(self, available):
+        """Aplica 'page_size' e 'max_rows' a um lote; retorna quantas linhas ficam."""
+        count, has_more, truncated = _take_rows(available, self.row_count, self.page_size,
+                                                self.offset, self.max_rows)
+        self.has_more = self.has_more or has_more
+        self.truncated = self.truncated or truncated
+        return count
+
+    def batches(self):
+        """Gera listas de tuplas (uma por fetch), respeitando 'page_size' e 'max_rows'."""
+        try:
+            while True:
+                with self.timer.stage("fetch"):
+                    rows = self.cursor.fetchmany()
+                if not rows:
+                    break
+                count = self._take(len(rows))
+                if count < len(rows):
+                    rows = rows[:count]
+                self.row_count += len(rows)
+                if rows:
+                    yield rows
+                if self.has_more or self.truncated:
+                    break
+        except oracledb.Error as e:
+            print(f"Erro ao ler resultado da query dinâmica: {e}")
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        if self.connection:
+            if self._owns_connection:
+                self.connection.close()
+            elif self.cursor:
+                self.cursor.close()
+            self.connection = None
+
+class ColumnarStream(QueryStream):
+    """
+    Variante colunar do QueryStream: 'batches()' gera RecordBatches do Arrow.
+    Usa o fetch de DataFrame do driver ('connection.fetch_df_batches') quando
+    disponível; em versões antigas do oracledb transpõe os lotes do cursor.
+    """
+
+    def _execute(self, sql, bind_params, arraysize, prefetch_rows):
+        # O Arrow já converte os tipos em lote: 'json_types' não se aplica
+        with self.timer.stage("execute"):
+            if hasattr(self.connection, "fetch_df_batches"):
+                frames = self.connection.fetch_df_batches(
+                    sql, bind_params, size=arraysize, fetch_decimals=False
+                )
+                self._source = (columnar.pyarrow.table(frame) for frame in frames)
+                # O 1º lote traz o schema. Sem linhas o driver pode não gerar
+                # lote nenhum: o schema vem então da descrição do cursor
+                self._first = next(self._source, None)
+                if self._first is not None:
+                    self.schema = self._first.schema
+                else:
+                    self._execute_cursor(sql, bind_params, arraysize, prefetch_rows)
+            else:
+                self._execute_cursor(sql, bind_params, arraysize, prefetch_rows)
+        self.headers = self.schema.names
+
+    def _execute_cursor(self, sql, bind_params, arraysize, prefetch_rows):
+        """Caminho pelo cursor: o schema vem do 'description' e os lotes são transpostos."""
+        self.cursor = self.connection.cursor()
+        self.cursor.arraysize = arraysize
+        self.cursor.prefetchrows = prefetch_rows
+        self.cursor.execute(sql, bind_params)
+        self.schema = columnar.arrow_schema(self.cursor.description)
+        self._source = self._fallback_tables()
+        self._first = None
+
+    def _restore_rowid_header(self):
+        super()._restore_rowid_header()
+        # Os lotes do Arrow também levam o nome da coluna
+        self.schema = columnar.pyarrow.schema([field.with_name(name) for field, name in zip(self.schema, self.headers)])
+        self._source = (table.rename_columns(self.headers) for table in self._source)
+        if self._first is not None:
+            self._first = self._first.rename_columns(self.headers)
+
+    def _fallback_tables(self):
+        while True:
+            rows = self.cursor.fetchmany()
+            if not rows:
+                return
+            yield columnar.pyarrow.Table.from_batches([columnar.record_batch_from_rows(self.schema, rows)])
+
+    def batches(self):
+        """Gera RecordBatches (um por fetch), respeitando 'page_size' e 'max_rows'."""
+        try:
+            while True:
+                with self.timer.stage("fetch"):
+                    if self._first is not None:
+                        table, self._first = self._first, None
+                    else:
+                        table = next(self._source, None)
+                if table is None:
+                    break
+                count = self._take(table.num_rows)
+                if count < table.num_rows:
+                    table = table.slice(0, count)
+                self.row_count += table.num_rows
+                for batch in table.to_batches():
+                    yield batch
+                if self.has_more or self.truncated:
+                    break
+        except oracledb.Error as e:
+            print(f"Erro ao ler resultado da query dinâmica: {e}")
+            raise
+        finally:
+            self.close()
+
+def execute_columnar_query(sql, bind_params, page_size=None, offset=0, timer=metrics.NULL_TIMER, max_rows=None,
+                           fetch_options=None):
+    """
+    SELECT dinâmico no modo colunar. Retorna {"headers", "columns", "row_count",
+    "next_offset", "truncated"}, com 'columns' = uma lista de valores por coluna.
+    """
+    stream = ColumnarStream(sql, bind_params, page_size, offset, timer, max_rows=max_rows,
+                            fetch_options=fetch_options)
+    batches = list(stream.batches())
+    with timer.stage("build"):
+        columns = columnar.columns_to_json(stream.headers, batches)
+    return {"headers": stream.headers, "columns": columns, "row_count": stream.row_count,
+            "next_offset": stream.next_offset, "truncated": stream.truncated}
+
+def execute_dynamic_query(sql, bind_params, page_size=None, offset=0, timer=metrics.NULL_TIMER, compact=False,
+                          max_rows=None, fetch_options=None):
+    """
+    Executa uma query de SELECT dinâmica. Com 'compact', as linhas ficam
+    como vieram do cursor (arrays na ordem de 'headers'), sem um dicionário por linha.
+    Com 'max_rows', 'truncated' indica que o resultado passou do teto.
+    O resultado vira JSON: os tipos vêm do json_output_type_handler.
+    """
+    stream = QueryStream(sql, bind_params, page_size, offset, timer, max_rows=max_rows,
+                         fetch_options=fetch_options, json_types=True)
+
+    col_names = stream.headers
+    results = []
+    for batch in stream.batches():
+        with timer.stage("build"):
+            if compact:
+                results.extend(batch)
+            else:
+                results.extend(dict(zip(col_names, row)) for row in batch)
     
-    # Ajusta a query para campos opcionais (ex: :ccit_ext)
-    # Se um parâmetro opcional não foi passado, a condição se torna "1=1"
-    for param in bind_params:
-        if param not in final_bind_params:
-             # Ex: "AND e.equ_num_serie = :ccit_ext" vira "AND 1=1"
-             sql = sql.replace(f"= :{param}", "= 1=1") 
+    # O frontend precisa dos nomes das colunas
+    return {"headers": col_names, "rows": results, "next_offset": stream.next_offset,
+            "truncated": stream.truncated}
+
+# --- Profiling (EXPLAIN PLAN / DBMS_XPLAN) ---
+# Estatísticas da sessão (V$MYSTAT) lidas antes e depois da execução
+PROFILE_STATS = {
+    "session logical reads": "logical_reads",
+    "physical reads": "physical_reads",
+    "SQL*Net roundtrips to/from client": "round_trips",
+    "CPU used by this session": "cpu_centiseconds",
+    "parse count (hard)": "hard_parses",
+}
+
+# Uma única leitura traz as estatísticas e o último SQL executado pela sessão
+_PROFILE_STATS_SQL = f"""
+SELECT n.name, s.value, se.prev_sql_id, se.prev_child_number
+FROM v$mystat s
+JOIN v$statname n ON n.statistic# = s.statistic#
+CROSS JOIN v$session se
+WHERE se.sid = SYS_CONTEXT('USERENV', 'SID')
+  AND n.name IN ({", ".join(f"'{name}'" for name in PROFILE_STATS)})
+"""
+
+def _session_stats(cursor):
+    """Retorna ({estatística: valor}, (sql_id, child_number) do SQL anterior)."""
+    cursor.execute(_PROFILE_STATS_SQL)
+    stats, previous = {}, (None, None)
+    for name, value, sql_id, child_number in cursor:
+        stats[PROFILE_STATS[name]] = value
+        previous = (sql_id, child_number)
+    return stats, previous
+
+def _profile_execution(cursor, sql, bind_params, timer):
+    """
+    Executa a query lendo (e descartando) todas as linhas, com
+    statistics_level=ALL para o DBMS_XPLAN mostrar linhas e buffers reais.
+    """
+    result = {}
+    cursor.execute("ALTER SESSION SET statistics_level = ALL")
+    try:
+        try:
+            before, _ = _session_stats(cursor)
+        except oracledb.Error as e:
+            # Sem acesso às views V$: mede só o tempo
+            before = None
+            result["stats_error"] = str(e)
+
+        start = time.perf_counter()
+        with timer.stage("execute"):
+            cursor.arraysize = Config.DB_FETCH_ARRAYSIZE
+            cursor.prefetchrows = Config.DB_FETCH_ARRAYSIZE
+            cursor.execute(sql, bind_params)
+            row_count = 0
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                row_count += len(rows)
+        result["elapsed_seconds"] = round(time.perf_counter() - start, 4)
+        result["rows"] = row_count
+
+        sql_id, child_number = None, None
+        if before is not None:
+            # Os round-trips incluem o da própria leitura das estatísticas
+            after, (sql_id, child_number) = _session_stats(cursor)
+            result["session_stats"] = {name: after[name] - before.get(name, 0) for name in after}
+            result["sql_id"] = sql_id
+
+        # sql_id NULL = último SQL executado pela sessão
+        try:
+            cursor.execute(
+                "SELECT plan_table_output FROM TABLE(DBMS_XPLAN.DISPLAY_CURSOR(:sql_id, :child_number, 'ALLSTATS LAST'))",
+                sql_id=sql_id, child_number=child_number)
+            result["runtime_plan"] = [line for (line,) in cursor]
+        except oracledb.Error as e:
+            result["runtime_plan_error"] = str(e)
+    finally:
+        cursor.execute("ALTER SESSION SET statistics_level = TYPICAL")
+    return result
+
+def profile_query(sql, bind_params, analyze=False, timer=metrics.NULL_TIMER):
+    """
+    Gera o plano (EXPLAIN PLAN + DBMS_XPLAN.DISPLAY) da query do catálogo
+    com os filtros informados. Com 'analyze', também executa a query e
+    registra tempo, leituras lógicas e round-trips (V$MYSTAT antes/depois)
+    e o plano real (DBMS_XPLAN.DISPLAY_CURSOR).
+    """
+    final_sql, final_binds = _prepare_query(sql, bind_params)
+    # STATEMENT_ID não aceita bind: gerado aqui, nunca vem da requisição
+    statement_id = f"qt_{uuid.uuid4().hex[:24]}"
+    profile = {"sql": final_sql, "analyze": bool(analyze)}
 
     connection = None
+    cursor = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(timer)
         cursor = connection.cursor()
-        
-        cursor.execute(sql, final_bind_params)
-        
-        col_names = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        
-        results = [dict(zip(col_names, row)) for row in rows]
-        
-        # O frontend precisa dos nomes das colunas
-        return {"headers": col_names, "rows": results}
-        
+
+        start = time.perf_counter()
+        with timer.stage("explain"):
+            # O modo thin exige um valor para cada bind do texto (DPY-4010);
+            # o EXPLAIN PLAN não olha os valores, então vão NULLs
+            cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR\n{final_sql}",
+                           dict.fromkeys(final_binds))
+            cursor.execute(
+                "SELECT plan_table_output FROM TABLE(DBMS_XPLAN.DISPLAY('PLAN_TABLE', :statement_id, 'TYPICAL'))",
+                statement_id=statement_id)
+            profile["plan"] = [line for (line,) in cursor]
+        profile["explain_seconds"] = round(time.perf_counter() - start, 4)
+        # Descarta as linhas gravadas no PLAN_TABLE
+        connection.rollback()
+
+        if analyze:
+            profile.update(_profile_execution(cursor, final_sql, final_binds, timer))
+        return profile
+
     except oracledb.Error as e:
-        print(f"Erro ao executar query dinâmica: {e}")
+        print(f"Erro ao gerar o plano da query: {e}")
         raise
     finally:
+        if cursor:
+            cursor.close()
         if connection:
             connection.close()
 
-def execute_dynamic_update(target_table, target_rowids, updates_to_make, update_rules):
+def build_update_statement(target_table, updates_to_make, update_rules):
     """
-    Executa o UPDATE validando contra as regras do JSON.
-    Esta é a função mais crítica.
+    Valida as alterações contra as regras do JSON e monta o UPDATE por ROWID.
+    Retorna a string SQL e o dicionário de binds comuns a todas as linhas.
     """
-    
-    # 1. Validar e construir a query de UPDATE
     set_clauses = []
     update_bind_params = {}
     
-    for i, (col_name, value) in enumerate(updates_to_make.items()):
+    for col_name, value in updates_to_make.items():
         # Verifica se a coluna está nas regras daquela query
         if col_name in update_rules:
-            bind_name = f"update_val_{i}"
+            # Numerado só entre as colunas aceitas: o mesmo SET efetivo gera
+            # o mesmo SQL (e cai no mesmo grupo em 'execute_update_operations')
+            bind_name = f"update_val_{len(set_clauses)}"
             # Pega a regra de formatação (ex: "TO_TIMESTAMP(...)")
             sql_snippet = update_rules[col_name].replace(":val_name", f":{bind_name}")
             
@@ -111,30 +773,109 @@ def execute_dynamic_update(target_table, target_rowids, updates_to_make, update_
 
     if not set_clauses:
         raise ValueError("Nenhuma alteração válida ou permitida foi fornecida.")
-    if not target_rowids:
-        raise ValueError("Nenhum ROWID foi selecionado para alteração.")
 
-    # 2. Montar a query final
     set_sql_string = ", ".join(set_clauses)
     query_update_final = f"UPDATE {target_table} SET {set_sql_string} WHERE rowid = :p_rowid"
+    return query_update_final, update_bind_params
+
+def _iter_array_dml(cursor, sql, row_binds, batch_size):
+    """
+    Envia 'sql' como array DML (executemany) em lotes de 'batch_size' linhas.
+    Cada lote é um único round-trip. Erros por linha são coletados via
+    batcherrors em vez de abortar o lote.
+    Gera (início_do_lote, linhas_afetadas_por_linha, [(índice, mensagem)]),
+    com índices relativos a 'row_binds'. Não faz commit.
+    """
+    for start in range(0, len(row_binds), batch_size):
+        cursor.executemany(sql, row_binds[start:start + batch_size],
+                           batcherrors=True, arraydmlrowcounts=True)
+        errors = [(start + error.offset, error.message) for error in cursor.getbatcherrors()]
+        # Contagem real de linhas afetadas (ROWID inexistente conta 0)
+        yield start, cursor.getarraydmlrowcounts(), errors
 
-    # 3. Executar a Transação
+def iter_update_batches(cursor, query_update_final, update_bind_params, target_rowids, batch_size=None):
+    """
+    Envia o UPDATE em lotes de 'batch_size' ROWIDs (ver '_iter_array_dml').
+    Gera (linhas_afetadas, erros_por_linha) de cada lote. Não faz commit.
+    """
+    batch_size = batch_size or Config.DB_UPDATE_BATCH_SIZE
+    row_binds = [dict(update_bind_params, p_rowid=row_id) for row_id in target_rowids]
+
+    for _, rowcounts, errors in _iter_array_dml(cursor, query_update_final, row_binds, batch_size):
+        row_errors = [{"rowid": target_rowids[index], "error": message} for index, message in errors]
+        yield sum(rowcounts), row_errors
+
+def execute_update_batches(cursor, query_update_final, update_bind_params, target_rowids, batch_size=None):
+    """Executa todos os lotes e retorna (linhas_afetadas, erros_por_linha). Não faz commit."""
+    updated_count = 0
+    row_errors = []
+    for batch_count, batch_errors in iter_update_batches(
+        cursor, query_update_final, update_bind_params, target_rowids, batch_size
+    ):
+        updated_count += batch_count
+        row_errors.extend(batch_errors)
+    return updated_count, row_errors
+
+def execute_dynamic_update(target_table, target_rowids, updates_to_make, update_rules,
+                           batch_size=None, commit_each_batch=False, progress=None,
+                           timer=metrics.NULL_TIMER, reread=None):
+    """
+    Executa o UPDATE validando contra as regras do JSON.
+    Esta é a função mais crítica.
+
+    Retorna {"updated_count": int, "row_errors": [{"rowid", "error"}]}.
+    Se alguma linha falhar, a transação inteira sofre ROLLBACK.
+
+    Com 'commit_each_batch' (jobs em segundo plano) cada lote é uma transação:
+    o primeiro lote com erro sofre ROLLBACK e interrompe a execução, e os lotes
+    anteriores permanecem comitados. 'progress(linhas, lotes_comitados)' é
+    chamado após cada lote.
+
+    'reread(connection)', se informado, é chamado na mesma sessão depois do
+    UPDATE e antes do COMMIT (enxerga os novos valores sem outra busca); o
+    retorno vai em "rows". Não se aplica a 'commit_each_batch'.
+    """
+    
+    # 1. Validar e construir a query de UPDATE
+    query_update_final, update_bind_params = build_update_statement(
+        target_table, updates_to_make, update_rules
+    )
+    if not target_rowids:
+        raise ValueError("Nenhum ROWID foi selecionado para alteração.")
+    timer.set_statement(query_update_final, update_bind_params)
+
+    # 2. Executar a Transação
     connection = None
     try:
-        connection = get_db_connection()
+        connection = get_db_connection(timer)
         cursor = connection.cursor()
+
+        if commit_each_batch:
+            return _execute_update_committing_batches(
+                connection, cursor, query_update_final, update_bind_params,
+                target_rowids, batch_size, progress
+            )
         
-        updated_count = 0
+        with timer.stage("execute"):
+            updated_count, row_errors = execute_update_batches(
+                cursor, query_update_final, update_bind_params, target_rowids, batch_size
+            )
         
-        for row_id in target_rowids:
-            loop_bind_params = update_bind_params.copy() 
-            loop_bind_params["p_rowid"] = row_id
-            
-            cursor.execute(query_update_final, loop_bind_params)
-            updated_count += 1
-        
-        connection.commit()
-        return updated_count
+        if row_errors:
+            print(f"Erro em {len(row_errors)} linha(s) durante o UPDATE dinâmico. Executando ROLLBACK.")
+            connection.rollback()
+            return {"updated_count": 0, "row_errors": row_errors}
+
+        result = {"updated_count": updated_count, "row_errors": []}
+        if reread is not None:
+            with timer.stage("reread"):
+                result["rows"] = reread(connection)
+
+        with timer.stage("commit"):
+            connection.commit()
+        if progress:
+            progress(len(target_rowids), 1)
+        return result
         
     except oracledb.Error as e:
         print(f"Erro durante o UPDATE dinâmico: {e}")
@@ -143,4 +884,97 @@ def execute_dynamic_update(target_table, target_rowids, updates_to_make, update_
         raise
     finally:
         if connection:
-            connection.close()
\ No newline at end of file
+            connection.close()
+
+def _execute_update_committing_batches(connection, cursor, query_update_final, update_bind_params,
+                                       target_rowids, batch_size, progress):
+    updated_count = 0
+    rows_processed = 0
+    batches_committed = 0
+    batch_size = batch_size or Config.DB_UPDATE_BATCH_SIZE
+
+    for batch_count, batch_errors in iter_update_batches(
+        cursor, query_update_final, update_bind_params, target_rowids, batch_size
+    ):
+        if batch_errors:
+            print(f"Erro em {len(batch_errors)} linha(s) no lote {batches_committed + 1}. ROLLBACK do lote.")
+            connection.rollback()
+            return {"updated_count": updated_count, "row_errors": batch_errors}
+
+        connection.commit()
+        updated_count += batch_count
+        rows_processed = min(rows_processed + batch_size, len(target_rowids))
+        batches_committed += 1
+        if progress:
+            progress(rows_processed, batches_committed)
+
+    return {"updated_count": updated_count, "row_errors": []}
+
+def execute_update_operations(operations, batch_size=None, timer=metrics.NULL_TIMER):
+    """
+    Aplica vários updates em UMA transação. 'operations' = lista de
+    {"target_table", "rowids", "updates", "update_rules"}.
+
+    Operações com o mesmo UPDATE (tabela + colunas do SET) são agrupadas e
+    enviadas juntas como array DML, todas na mesma sessão do pool.
+    Qualquer erro de linha desfaz TUDO (ROLLBACK); sem erros, um único COMMIT.
+
+    Retorna {"updated_count", "operation_counts": [por operação], "groups",
+    "row_errors": [{"operation", "rowid", "error"}]}.
+    """
+    # 1. Validar todas as operações antes de abrir a sessão
+    groups = {} # sql -> (binds por linha, [(operação, rowid)])
+    for index, op in enumerate(operations):
+        if not op["rowids"]:
+            raise ValueError(f"Operação {index}: nenhum ROWID foi selecionado para alteração.")
+        try:
+            # Colunas em ordem fixa: o mesmo conjunto de colunas gera o mesmo SQL
+            updates = dict(sorted(op["updates"].items()))
+            sql, update_bind_params = build_update_statement(op["target_table"], updates, op["update_rules"])
+        except ValueError as e:
+            raise ValueError(f"Operação {index}: {e}")
+        row_binds, origins = groups.setdefault(sql, ([], []))
+        for row_id in op["rowids"]:
+            row_binds.append(dict(update_bind_params, p_rowid=row_id))
+            origins.append((index, row_id))
+
+    operation_counts = [0] * len(operations)
+    row_errors = []
+    batch_size = batch_size or Config.DB_UPDATE_BATCH_SIZE
+
+    # 2. Executar todos os grupos na mesma transação
+    connection = None
+    try:
+        connection = get_db_connection(timer)
+        cursor = connection.cursor()
+
+        with timer.stage("execute"):
+            for sql, (row_binds, origins) in groups.items():
+                timer.set_statement(sql, None)
+                for start, rowcounts, errors in _iter_array_dml(cursor, sql, row_binds, batch_size):
+                    for offset, count in enumerate(rowcounts):
+                        operation_counts[origins[start + offset][0]] += count
+                    row_errors.extend(
+                        {"operation": origins[i][0], "rowid": origins[i][1], "error": message}
+                        for i, message in errors
+                    )
+
+        if row_errors:
+            print(f"Erro em {len(row_errors)} linha(s) durante o update em lote. Executando ROLLBACK.")
+            connection.rollback()
+            return {"updated_count": 0, "operation_counts": [0] * len(operations),
+                    "groups": len(groups), "row_errors": row_errors}
+
+        with timer.stage("commit"):
+            connection.commit()
+        return {"updated_count": sum(operation_counts), "operation_counts": operation_counts,
+                "groups": len(groups), "row_errors": []}
+
+    except oracledb.Error as e:
+        print(f"Erro durante o update em lote: {e}")
+        if connection:
+            connection.rollback()
+        raise
+    finally:
+        if connection:
+            connection.close()
@@ -1,9 +1,23 @@
-from flask import current_app, render_template, request, jsonify
+import hashlib
+import oracledb
+from flask import current_app, render_template, request, jsonify, Response
 from . import db
 from .core import query_manager
+from .core import metrics
+from .core import columnar
+from .core import export
+from .core import compression
+from .core.jobs import job_manager, JobQueueFull
+from .core.admission import admission, AdmissionRejected
+from .core.result_cache import result_cache
 
 app = current_app
 
+@app.after_request
+def compress_response(response):
+    """gzip/brotli negociado pelo Accept-Encoding (JSON, NDJSON e CSV)."""
+    return compression.compress_response(response, request.headers.get("Accept-Encoding"))
+
 @app.route("/")
 def index():
     """Renderiza a página HTML principal (o gerenciador)."""
@@ -28,8 +42,9 @@ def api_get_query(query_id):
 @app.route("/api/query/<query_id>", methods=['POST'])
 def api_save_query(query_id):
     """
-    SALVA a string SQL editada de volta no queries.json.
-    ALERTA: Esta rota permite a alteração do arquivo de queries.
+    SALVA a string SQL editada (nova versão da query no catálogo).
+    ALERTA: Esta rota permite a alteração do catálogo de queries.
+    Opcional: 'version' = versão carregada pelo editor (409 se já mudou).
     """
     try:
         data = request.json
@@ -38,18 +53,198 @@ def api_save_query(query_id):
         if not new_sql:
             return jsonify({"error": "SQL não pode ser vazio."}), 400
 
-        if query_manager.save_query_sql(query_id, new_sql):
-            return jsonify({"success": True, "message": "Query salva com sucesso!"}), 200
+        version = query_manager.save_query_sql(query_id, new_sql, data.get('version'))
+        if version:
+            return jsonify({"success": True, "message": "Query salva com sucesso!", "version": version}), 200
         else:
             return jsonify({"error": "Falha ao salvar a query no servidor."}), 500
             
+    except query_manager.QueryVersionConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Erro ao salvar query: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/api/query/<query_id>/history", methods=['GET'])
+def api_get_query_history(query_id):
+    """Edições salvas do SQL da query (versão, data e SQL de cada uma)."""
+    return jsonify({"history": query_manager.get_query_history(query_id)}), 200
+
+@app.route("/api/query/<query_id>/profile", methods=['GET'])
+def api_get_query_profiles(query_id):
+    """Histórico de perfis (planos e estatísticas) gravados para a query."""
+    return jsonify({"profiles": query_manager.get_query_profiles(query_id)}), 200
+
+@app.route("/api/query/<query_id>/profile", methods=['POST'])
+def api_profile_query(query_id):
+    """
+    Gera o plano da query com os parâmetros informados ({"params", "analyze"}).
+    Com "analyze": true a query é executada para medir tempo, leituras
+    lógicas e round-trips. O perfil é gravado e comparado com o da
+    versão anterior do SQL.
+    """
+    timer = metrics.NULL_TIMER
+    try:
+        data = request.json or {}
+        params = data.get('params') or {}
+        analyze = bool(data.get('analyze'))
+
+        query_obj = query_manager.get_query_by_id(query_id)
+        if not query_obj:
+            return jsonify({"error": "Query não encontrada."}), 404
+
+        missing = query_manager.get_missing_required_params(query_obj, params)
+        if missing:
+            return jsonify({"error": f"Parâmetros obrigatórios não informados: {', '.join(missing)}"}), 400
+
+        timer = metrics.RequestTimer("profile", query_id)
+        profile = db.profile_query(query_obj['sql'], params, analyze, timer)
+        timer.finish(rows=profile.get("rows", 0))
+
+        profile, baseline = query_manager.save_query_profile(query_id, query_obj['sql'], params, profile)
+        return jsonify({"profile": profile,
+                        "comparison": query_manager.compare_profiles(profile, baseline)}), 200
+
+    except Exception as e:
+        print(f"Erro ao gerar o perfil da query: {e}")
+        timer.finish(error=True)
+        return jsonify({"error": f"Erro interno no servidor: {e}"}), 500
+
+@app.route("/api/pool", methods=['GET'])
+def api_pool_stats():
+    """Retorna as estatísticas do pool de sessões (monitoramento)."""
+    return jsonify(db.get_pool_stats()), 200
+
+def _row_hash(row_json):
+    """Hash de uma linha como o cliente a recebe (JSON dos valores, na ordem das colunas)."""
+    return hashlib.sha1(row_json.encode("utf-8")).hexdigest()[:16]
+
+def _client_rows(batch, columnar_mode, dumps):
+    """
+    Gera (valores, json_da_linha) de um lote, com os valores no formato que
+    o cliente recebe: crus no modo por linhas, convertidos no modo colunar.
+    """
+    if columnar_mode:
+        rows = zip(*columnar.batch_columns(batch))
+    else:
+        rows = batch
+    for row in rows:
+        values = list(row)
+        yield values, dumps(values)
+
+def _admission_error(e):
+    """Resposta 429/503 do controle de admissão, com o Retry-After."""
+    response = jsonify({"error": str(e)})
+    response.status_code = e.status
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+def _ndjson_search_response(stream, first_batch, batches, update_rules, timer, row_hashes=False, release=None):
+    """
+    Resposta em NDJSON: 1ª linha = cabeçalhos e regras, depois uma linha
+    (array) por registro, e por fim o resumo com o cursor da próxima página.
+    No modo colunar cada lote vira uma única linha {"columns": [...]}.
+    Com 'row_hashes' cada lote é seguido de {"hashes": [...]} (ver /api/recarregar).
+    'release' libera a vaga do controle de admissão ao fim da leitura.
+    """
+    dumps = app.json.dumps
+    columnar_mode = isinstance(stream, db.ColumnarStream)
+
+    def generate():
+        sent_bytes = 0
+        try:
+            chunk = dumps({"headers": stream.headers, "update_rules": update_rules}) + "\n"
+            sent_bytes += len(chunk)
+            yield chunk
+            batch = first_batch
+            while batch is not None:
+                # Um chunk por lote do cursor (não um por linha)
+                with timer.stage("serialize"):
+                    if row_hashes:
+                        if columnar_mode:
+                            columns = columnar.batch_columns(batch)
+                            chunk = columnar.batch_to_json(batch, columns) + "\n"
+                            lines = [dumps(list(row)) for row in zip(*columns)]
+                        else:
+                            lines = [dumps(list(row)) for row in batch]
+                            chunk = "".join(line + "\n" for line in lines)
+                        chunk += dumps({"hashes": [_row_hash(line) for line in lines]}) + "\n"
+                    elif columnar_mode:
+                        chunk = columnar.batch_to_json(batch) + "\n"
+                    else:
+                        chunk = "".join(dumps(list(row)) + "\n" for row in batch)
+                sent_bytes += len(chunk)
+                yield chunk
+                batch = next(batches, None)
+        except Exception as e:
+            # O status HTTP já foi enviado; o erro segue como última linha
+            print(e)
+            timer.finish(rows=stream.row_count, response_bytes=sent_bytes, error=True)
+            yield dumps({"error": f"Erro interno no servidor: {e}"}) + "\n"
+            return
+        finally:
+            # Cliente desconectado no meio do envio: devolve a sessão ao pool
+            batches.close()
+            if release is not None:
+                release()
+        next_offset = stream.next_offset
+        chunk = dumps({
+            "done": True,
+            "row_count": stream.row_count,
+            "next_cursor": db.encode_page_cursor(next_offset) if next_offset is not None else None,
+            "truncated": stream.truncated,
+            "max_rows": stream.max_rows
+        }) + "\n"
+        timer.finish(rows=stream.row_count, response_bytes=sent_bytes + len(chunk))
+        yield chunk
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+@app.route("/metrics", methods=['GET'])
+def metrics_endpoint():
+    """Métricas no formato texto do Prometheus."""
+    pool = db.get_pool_stats()
+    cache = result_cache.stats()
+    queue = admission.stats()
+    gauges = [
+        ("query_tool_pool_sessions", "Sessões do pool Oracle por estado.",
+         {(("state", "opened"),): pool.get("opened", 0), (("state", "busy"),): pool.get("busy", 0)}),
+        ("query_tool_pool_max_sessions", "Tamanho máximo do pool Oracle.", {(): pool.get("max", 0)}),
+        ("query_tool_result_cache_entries", "Entradas no cache de resultados.", {(): cache["entries"]}),
+        ("query_tool_result_cache_bytes", "Memória estimada do cache de resultados.", {(): cache["bytes"]}),
+        ("query_tool_result_cache_events", "Eventos do cache de resultados desde o início.",
+         {(("event", name),): cache[name] for name in ("hits", "misses", "evictions", "expirations", "invalidations")}),
+        ("query_tool_admission_queries", "Buscas no controle de admissão por estado.",
+         {(("state", "running"),): queue["running"], (("state", "waiting"),): queue["waiting"]}),
+    ]
+    return Response(metrics.registry.render(gauges), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/cache", methods=['GET'])
+def api_cache_stats():
+    """Retorna os contadores do cache de resultados (monitoramento)."""
+    return jsonify(result_cache.stats()), 200
+
+@app.route("/api/admission", methods=['GET'])
+def api_admission_stats():
+    """Buscas em execução e na fila do controle de admissão (monitoramento)."""
+    return jsonify(admission.stats()), 200
+
 @app.route("/api/buscar", methods=['POST'])
 def api_buscar():
-    """Executa a busca dinâmica."""
+    """
+    Executa a busca dinâmica.
+    Opcional: 'page_size' + 'cursor' para paginação e 'stream': true para NDJSON.
+    Queries com "fetch_mode": "columnar" respondem 'columns' em vez de 'rows'.
+    'row_hashes': true inclui o hash de cada linha (usado por /api/recarregar).
+    'format': 'compact' devolve 'rows' como arrays na ordem de 'headers' (o
+    NDJSON já é sempre assim).
+    Buscas que vão ao banco passam pelo controle de admissão (429 com a fila
+    cheia, 503 se a espera esgotar) e respeitam o teto "max_rows" da query
+    ('truncated': true quando o resultado foi cortado).
+    """
+    timer = metrics.NULL_TIMER
     try:
         data = request.json
         query_id = data.get('query_id')
@@ -58,26 +253,322 @@ def api_buscar():
         if not query_id or not params:
             return jsonify({"error": "Query ID e Parâmetros são obrigatórios."}), 400
 
+        try:
+            page_size = db.normalize_page_size(data.get('page_size'))
+            offset = db.decode_page_cursor(data.get('cursor'))
+            compact = db.normalize_row_format(data.get('format')) == "compact"
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         query_obj = query_manager.get_query_by_id(query_id)
         if not query_obj:
             return jsonify({"error": "Query não encontrada."}), 404
 
-        results = db.execute_dynamic_query(query_obj['sql'], params)
-        
-        if not results.get("rows"):
+        missing = query_manager.get_missing_required_params(query_obj, params)
+        if missing:
+            return jsonify({"error": f"Parâmetros obrigatórios não informados: {', '.join(missing)}"}), 400
+
+        update_rules = query_obj.get("update_rules", {})
+        max_rows = db.query_max_rows(query_obj)
+        fetch_options = db.query_fetch_options(query_obj)
+        timer = metrics.RequestTimer("search", query_id)
+
+        # Modo colunar ("fetch_mode": "columnar"): lotes Arrow serializados por coluna
+        use_columnar = columnar.is_columnar(query_obj)
+        if use_columnar and not columnar.available():
+            print(f"AVISO: Query '{query_id}' pede o modo colunar, mas o pyarrow não está instalado. Usando o modo por linhas.")
+            use_columnar = False
+
+        if data.get('stream'):
+            stream_class = db.ColumnarStream if use_columnar else db.QueryStream
+            # A vaga fica reservada até o fim do envio (liberada pelo gerador)
+            release = admission.acquire(query_obj, timer)
+            try:
+                stream = stream_class(query_obj['sql'], params, page_size, offset, timer, max_rows=max_rows,
+                                      fetch_options=fetch_options, json_types=True)
+                batches = stream.batches()
+                first_batch = next(batches, None)
+            except BaseException:
+                release()
+                raise
+            if first_batch is None:
+                release()
+                timer.finish()
+                return jsonify({"message": "Nenhum registro encontrado."}), 404
+            return _ndjson_search_response(stream, first_batch, batches, update_rules, timer,
+                                           row_hashes=bool(data.get('row_hashes')), release=release)
+
+        # Cache de resultados (só no modo JSON; o streaming é para resultados grandes)
+        cache_key = None
+        results = None
+        if result_cache.enabled:
+            cache_key = result_cache.make_key(query_id, query_obj['sql'], params, page_size, offset, use_columnar, compact,
+                                              max_rows)
+            with timer.stage("cache"):
+                results = result_cache.get(cache_key)
+        if results is None:
+            generation = result_cache.generation
+            release = admission.acquire(query_obj, timer)
+            try:
+                if use_columnar:
+                    results = db.execute_columnar_query(query_obj['sql'], params, page_size, offset, timer,
+                                                        max_rows, fetch_options)
+                else:
+                    results = db.execute_dynamic_query(query_obj['sql'], params, page_size, offset, timer,
+                                                       compact, max_rows, fetch_options)
+            finally:
+                release()
+            if cache_key is not None:
+                result_cache.put(cache_key, results, generation)
+
+        row_count = results["row_count"] if use_columnar else len(results["rows"])
+        if not row_count:
+             timer.finish()
              return jsonify({"message": "Nenhum registro encontrado."}), 404
 
+        # Cópia rasa: o dicionário em cache não pode ser alterado
+        results = dict(results)
+        next_offset = results.pop("next_offset")
+        if page_size:
+            results["next_cursor"] = db.encode_page_cursor(next_offset) if next_offset is not None else None
+
         # Anexa as regras de update na resposta, pois o form de update precisa saber
-        results["update_rules"] = query_obj.get("update_rules", {})
-        return jsonify(results), 200
+        results["update_rules"] = update_rules
+        results["max_rows"] = max_rows
+        with timer.stage("serialize"):
+            if data.get('row_hashes'):
+                dumps = app.json.dumps
+                if use_columnar:
+                    rows = zip(*results["columns"])
+                elif compact:
+                    rows = results["rows"]
+                else:
+                    rows = (row.values() for row in results["rows"])
+                results["row_hashes"] = [_row_hash(dumps(list(row))) for row in rows]
+            response = jsonify(results)
+        timer.finish(rows=row_count, response_bytes=len(response.get_data()))
+        return response, 200
 
+    except AdmissionRejected as e:
+        timer.finish(error=True)
+        return _admission_error(e)
     except Exception as e:
         print(e)
+        timer.finish(error=True)
         return jsonify({"error": f"Erro interno no servidor: {e}"}), 500
 
+@app.route("/api/export/<query_id>", methods=['GET', 'POST'])
+def api_export(query_id):
+    """
+    Exporta o resultado completo da query em CSV (padrão), Parquet ou Arrow,
+    lendo o cursor em lotes (memória constante, qualquer que seja o volume).
+    GET: ?format=csv&<bind_name>=<valor>...  POST: {"format", "params"}.
+    Passa pelo controle de admissão e respeita o teto "max_rows" da query.
+    """
+    timer = metrics.NULL_TIMER
+    try:
+        if request.method == 'POST':
+            data = request.json or {}
+            export_format = data.get('format') or "csv"
+            params = data.get('params') or {}
+        else:
+            export_format = request.args.get('format') or "csv"
+            params = {k: v for k, v in request.args.items() if k != 'format'}
+
+        try:
+            export.check_format(export_format)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        query_obj = query_manager.get_query_by_id(query_id)
+        if not query_obj:
+            return jsonify({"error": "Query não encontrada."}), 404
+
+        # Mesma regra de /api/buscar para os parâmetros do queries.json
+        missing = query_manager.get_missing_required_params(query_obj, params)
+        if missing:
+            return jsonify({"error": f"Parâmetros obrigatórios não informados: {', '.join(missing)}"}), 400
+
+        timer = metrics.RequestTimer("export", query_id)
+        release = admission.acquire(query_obj, timer)
+        try:
+            # Sem o json_output_type_handler: CSV/Parquet/Arrow usam os tipos do Oracle
+            stream = db.QueryStream(query_obj['sql'], params, timer=timer, max_rows=db.query_max_rows(query_obj),
+                                    fetch_options=db.query_fetch_options(query_obj))
+        except BaseException:
+            release()
+            raise
+    except AdmissionRejected as e:
+        timer.finish(error=True)
+        return _admission_error(e)
+    except Exception as e:
+        print(e)
+        timer.finish(error=True)
+        return jsonify({"error": f"Erro interno no servidor: {e}"}), 500
+
+    mimetype, extension, _ = export.EXPORT_FORMATS[export_format]
+    batches = stream.batches()
+    counter = {"rows": 0}
+    if export_format == "csv":
+        chunks = export.iter_csv(stream.headers, batches, counter)
+    else:
+        chunks = export.iter_columnar(export_format, stream.description, batches, counter)
+
+    def generate():
+        sent_bytes = 0
+        error = False
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                sent_bytes += len(chunk)
+                yield chunk
+        except Exception as e:
+            # O status HTTP já foi enviado: o arquivo fica truncado e o erro vai para o log
+            print(f"Erro durante a exportação de '{query_id}': {e}")
+            error = True
+        finally:
+            # Cliente desconectado no meio do download: devolve a sessão ao pool
+            batches.close()
+            release()
+            if stream.truncated:
+                print(f"AVISO: Exportação de '{query_id}' cortada no teto de {stream.max_rows} linhas (max_rows).")
+            timer.finish(rows=counter["rows"], response_bytes=sent_bytes, error=error)
+
+    return Response(generate(), mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{query_id}.{extension}"'
+    })
+
+@app.route("/api/recarregar", methods=['POST'])
+def api_recarregar():
+    """
+    Refresh incremental: relê só as linhas exibidas, por ROWID, e devolve
+    apenas as que mudaram. Corpo: {"query_id", "params", "rows": {rowid: hash}}
+    com os hashes recebidos da busca ('row_hashes': true).
+    Resposta: {"headers", "rows", "hashes", "removed", "unchanged"}; 'removed'
+    lista os ROWIDs que não existem mais ou deixaram de atender aos filtros.
+    """
+    timer = metrics.NULL_TIMER
+    try:
+        data = request.json
+        query_id = data.get('query_id')
+        params = data.get('params') or {}
+        known_hashes = data.get('rows')
+
+        if not query_id or not known_hashes or not isinstance(known_hashes, dict):
+            return jsonify({"error": "Query ID e ROWIDs exibidos são obrigatórios."}), 400
+
+        query_obj = query_manager.get_query_by_id(query_id)
+        if not query_obj:
+            return jsonify({"error": "Query não encontrada."}), 404
+
+        missing = query_manager.get_missing_required_params(query_obj, params)
+        if missing:
+            return jsonify({"error": f"Parâmetros obrigatórios não informados: {', '.join(missing)}"}), 400
+
+        timer = metrics.RequestTimer("refresh", query_id)
+        result = _reread_rows(query_obj, params, list(known_hashes), timer, known_hashes)
+
+        with timer.stage("serialize"):
+            response = jsonify(result)
+        timer.finish(rows=len(result["rows"]) + result["unchanged"], response_bytes=len(response.get_data()))
+        return response, 200
+
+    except ValueError as e:
+        timer.finish(error=True)
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(e)
+        timer.finish(error=True)
+        return jsonify({"error": f"Erro interno no servidor: {e}"}), 500
+
+def _reread_rows(query_obj, params, rowids, timer, known_hashes=None, connection=None):
+    """
+    Relê as linhas 'rowids' pela query do catálogo (com os filtros da busca),
+    no formato que o cliente recebe. Com 'known_hashes' devolve só as que
+    mudaram; com 'connection' lê na sessão informada (antes do COMMIT).
+    Retorna {"headers", "rows", "hashes", "removed", "unchanged"}.
+    """
+    use_columnar = columnar.is_columnar(query_obj) and columnar.available()
+    stream_class = db.ColumnarStream if use_columnar else db.QueryStream
+    dumps = app.json.dumps
+
+    headers = None
+    changed_rows = []
+    changed_hashes = []
+    seen = set()
+    for start in range(0, len(rowids), db.REFRESH_CHUNK_SIZE):
+        # Um round-trip por lote de até REFRESH_CHUNK_SIZE ROWIDs
+        stream = stream_class(query_obj['sql'], params, timer=timer,
+                              rowids=rowids[start:start + db.REFRESH_CHUNK_SIZE], connection=connection,
+                              json_types=True)
+        headers = stream.headers
+        rowid_index = next((i for i, h in enumerate(headers) if h.upper() == "ROWID"), 0)
+        for batch in stream.batches():
+            with timer.stage("build"):
+                for values, line in _client_rows(batch, use_columnar, dumps):
+                    rowid = values[rowid_index]
+                    seen.add(rowid)
+                    row_hash = _row_hash(line)
+                    if known_hashes is None or known_hashes.get(rowid) != row_hash:
+                        changed_rows.append(values)
+                        changed_hashes.append(row_hash)
+
+    return {
+        "headers": headers,
+        "rows": changed_rows,
+        "hashes": changed_hashes,
+        "removed": [rowid for rowid in rowids if rowid not in seen],
+        "unchanged": len(seen) - len(changed_rows)
+    }
+
+def _enqueue_update_job(query_id, target_table, target_rowids, updates, update_rules):
+    """
+    Modo assíncrono de /api/atualizar: valida as regras, enfileira o UPDATE
+    (um commit por lote) e responde 202 com o id do job na hora.
+    """
+    # Erros de validação (update_rules) aparecem já na requisição, não no job
+    db.build_update_statement(target_table, updates, update_rules)
+
+    def run_update(progress):
+        try:
+            return db.execute_dynamic_update(
+                target_table, target_rowids, updates, update_rules,
+                commit_each_batch=True, progress=progress
+            )
+        finally:
+            # Lotes comitados invalidam o cache mesmo se o job falhar no meio
+            result_cache.invalidate_queries(query_manager.get_query_ids_for_table(target_table))
+
+    try:
+        job = job_manager.submit("update", len(target_rowids), run_update)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+
+    return jsonify({
+        "job_id": job.id,
+        "status_url": f"/api/jobs/{job.id}",
+        "message": f"Atualização de {len(target_rowids)} linhas enfileirada (query '{query_id}')."
+    }), 202
+
+@app.route("/api/jobs/<job_id>", methods=['GET'])
+def api_job_status(job_id):
+    """Progresso de um job em segundo plano."""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({"error": "Job não encontrado."}), 404
+    return jsonify(job.to_dict()), 200
+
 @app.route("/api/atualizar", methods=['POST'])
 def api_atualizar():
-    """Executa o update dinâmico."""
+    """
+    Executa o update dinâmico.
+    Com 'async': true o UPDATE roda em segundo plano (ver /api/jobs/<id>).
+    Com 'return_rows': true (e os 'params' da busca) a resposta traz as linhas
+    alteradas já com os novos valores, relidas na mesma transação antes do
+    COMMIT, no formato de /api/recarregar ("headers", "rows", "hashes", "removed").
+    """
+    timer = metrics.NULL_TIMER
     try:
         data = request.json
         query_id = data.get('query_id')
@@ -98,13 +589,122 @@ def api_atualizar():
         if not target_table:
              return jsonify({"error": "'target_table' não definida no JSON para esta query."}), 500
 
-        updated_count = db.execute_dynamic_update(target_table, target_rowids, updates, update_rules)
+        if data.get('async') and job_manager.enabled:
+            return _enqueue_update_job(query_id, target_table, target_rowids, updates, update_rules)
+
+        timer = metrics.RequestTimer("update", query_id)
+        reread = None
+        if data.get('return_rows'):
+            params = data.get('params') or {}
+            missing = query_manager.get_missing_required_params(query_obj, params)
+            if missing:
+                return jsonify({"error": f"Parâmetros obrigatórios não informados: {', '.join(missing)}"}), 400
+
+            def reread(connection):
+                try:
+                    return _reread_rows(query_obj, params, target_rowids, timer, connection=connection)
+                except (ValueError, oracledb.Error) as e:
+                    # Sem as linhas a tela refaz a leitura; o UPDATE segue normalmente
+                    print(f"AVISO: Não foi possível reler as linhas alteradas: {e}")
+                    return None
+
+        result = db.execute_dynamic_update(target_table, target_rowids, updates, update_rules,
+                                           timer=timer, reread=reread)
+        timer.finish(rows=result["updated_count"], error=bool(result["row_errors"]))
+
+        if result["updated_count"]:
+            # Resultados em cache de queries que leem esta tabela ficaram velhos
+            result_cache.invalidate_queries(query_manager.get_query_ids_for_table(target_table))
+
+        if result["row_errors"]:
+            return jsonify({
+                "error": f"{len(result['row_errors'])} linha(s) falharam. Nenhuma alteração foi salva (ROLLBACK).",
+                "row_errors": result["row_errors"]
+            }), 400
         
-        return jsonify({
+        response = {
             "success": True, 
-            "message": f"Sucesso! {updated_count} linhas foram atualizadas e comitadas."
+            "updated_count": result["updated_count"],
+            "message": f"Sucesso! {result['updated_count']} linhas foram atualizadas e comitadas."
+        }
+        if result.get("rows"):
+            response.update(result["rows"])
+        return jsonify(response), 200
+
+    except Exception as e:
+        print(e)
+        timer.finish(error=True)
+        return jsonify({"error": f"Erro ao atualizar: {e}"}), 500
+
+@app.route("/api/atualizar/lote", methods=['POST'])
+def api_atualizar_lote():
+    """
+    Aplica várias operações de update (de uma ou mais queries) em uma única
+    transação. Corpo: {"operations": [{"query_id", "rowids", "updates"}, ...]}.
+    Ou todas são comitadas, ou nenhuma (ROLLBACK).
+    """
+    timer = metrics.NULL_TIMER
+    try:
+        data = request.json
+        operations = data.get('operations')
+
+        if not operations or not isinstance(operations, list):
+            return jsonify({"error": "Informe a lista 'operations'."}), 400
+
+        # Valida cada operação contra o queries.json (tabela-alvo e regras)
+        prepared = []
+        target_tables = set()
+        for index, op in enumerate(operations):
+            query_id = op.get('query_id')
+            if not query_id or not op.get('rowids') or not op.get('updates'):
+                return jsonify({"error": f"Operação {index}: dados insuficientes para atualização."}), 400
+
+            query_obj = query_manager.get_query_by_id(query_id)
+            if not query_obj:
+                return jsonify({"error": f"Operação {index}: query '{query_id}' não encontrada."}), 404
+
+            target_table = query_obj.get("target_table")
+            if not target_table:
+                return jsonify({"error": f"Operação {index}: 'target_table' não definida no JSON para a query '{query_id}'."}), 500
+
+            prepared.append({
+                "target_table": target_table,
+                "rowids": op['rowids'],
+                "updates": op['updates'],
+                "update_rules": query_obj.get("update_rules", {})
+            })
+            target_tables.add(target_table)
+
+        timer = metrics.RequestTimer("batch_update", "-")
+        try:
+            result = db.execute_update_operations(prepared, timer=timer)
+        except ValueError as e:
+            timer.finish(error=True)
+            return jsonify({"error": str(e)}), 400
+        timer.finish(rows=result["updated_count"], error=bool(result["row_errors"]))
+
+        if result["updated_count"]:
+            # Resultados em cache de queries que leem estas tabelas ficaram velhos
+            affected = set()
+            for table in target_tables:
+                affected.update(query_manager.get_query_ids_for_table(table))
+            result_cache.invalidate_queries(affected)
+
+        if result["row_errors"]:
+            return jsonify({
+                "error": f"{len(result['row_errors'])} linha(s) falharam. Nenhuma alteração foi salva (ROLLBACK).",
+                "row_errors": result["row_errors"]
+            }), 400
+
+        return jsonify({
+            "success": True,
+            "updated_count": result["updated_count"],
+            "operation_counts": result["operation_counts"],
+            "message": (f"Sucesso! {result['updated_count']} linhas de {len(operations)} operações "
+                        f"foram atualizadas e comitadas em uma única transação.")
         }), 200
 
     except Exception as e:
         print(e)
-        return jsonify({"error": f"Erro ao atualizar: {e}"}), 500
\ No newline at end of file
+        timer.finish(error=True)
+        return jsonify({"error": f"Erro ao atualizar: {e}"}), 500
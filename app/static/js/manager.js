@@ -14,6 +14,9 @@ document.addEventListener("DOMContentLoaded", () => {
     const feedbackMessage = document.getElementById("feedback-message");
     const btnBuscar = document.getElementById("btn-buscar");
     const btnAtualizar = document.getElementById("btn-atualizar");
+    const btnLoadMore = document.getElementById("btn-load-more");
+    const scrollContainer = document.getElementById("results-scroll");
+    const selectionInfo = document.getElementById("selection-info");
     
     // --- Seletores do Modal ---
     const queryModal = document.getElementById("query-modal");
@@ -27,7 +30,28 @@ document.addEventListener("DOMContentLoaded", () => {
     let currentQueryId = null;
     let currentQueryData = {}; // Armazena o objeto da query (sql, params, rules)
     let currentResultHeaders = []; // Armazena cabeçalhos da busca
+    let currentSearchParams = {}; // Filtros da última busca (para paginação)
+    let nextPageCursor = null; // Token da próxima página (null = fim)
     let tableSelectAllCheckbox = null;
+    let tableBody = null;
+    // A tabela é virtualizada: as linhas ficam só em memória e apenas as
+    // visíveis na área de rolagem viram <tr>. A seleção também vive aqui.
+    let resultRows = []; // Linhas recebidas (arrays, na ordem dos cabeçalhos)
+    let rowIndexById = new Map(); // ROWID -> posição em resultRows
+    let selectedRowIds = new Set(); // ROWIDs selecionados
+    let rowidIndex = -1; // Posição da coluna ROWID nos cabeçalhos
+    let rowHeight = 0; // Altura (px) de uma linha, medida na 1ª renderização
+    let renderScheduled = false;
+    let loadingPage = false;
+    let rowHashes = new Map(); // ROWID -> hash da linha (para o refresh incremental)
+    let hashTargets = []; // ROWIDs na ordem de chegada, aguardando o hash
+
+    const SEARCH_PAGE_SIZE = Number(document.body.dataset.searchPageSize) || 500; // Config.SEARCH_PAGE_SIZE
+    const ASYNC_UPDATE_THRESHOLD = 2000; // Linhas a partir das quais o update vira job
+    const JOB_POLL_INTERVAL_MS = 1000;
+    const DEFAULT_ROW_HEIGHT = 41;
+    const OVERSCAN_ROWS = 10; // Linhas renderizadas além da área visível
+    const PREFETCH_ROWS = 200; // Busca a próxima página ao chegar a N linhas do fim
 
     // --- 1. Evento: Seleção de Query ---
     querySelect.addEventListener("change", () => {
@@ -114,34 +138,13 @@ document.addEventListener("DOMContentLoaded", () => {
         for (let [key, value] of formData.entries()) {
             params[key] = value;
         }
-
-        const data = {
-            query_id: currentQueryId,
-            params: params
-        };
+        currentSearchParams = params;
 
         try {
-            const response = await fetch("/api/buscar", {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify(data),
-            });
-
-            if (response.status === 404) {
+            const found = await loadResultsPage(null);
+            if (!found) {
                 showNoResults();
-            } else if (!response.ok) {
-                const errorData = await response.json();
-                throw new Error(errorData.error || `Erro ${response.status}`);
-            } else {
-                const resultData = await response.json();
-                currentResultHeaders = resultData.headers;
-                // Guarda as regras de update recebidas do servidor
-                currentQueryData.update_rules = resultData.update_rules; 
-                
-                displayResults(resultData.headers, resultData.rows);
-                buildUpdateForm(resultData.headers, resultData.update_rules);
             }
-
         } catch (error) {
             showFeedback(error.message, "error");
         } finally {
@@ -150,6 +153,126 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     });
 
+    btnLoadMore.addEventListener("click", loadNextPage);
+
+    async function loadNextPage() {
+        if (loadingPage || !nextPageCursor) return;
+        loadingPage = true;
+        btnLoadMore.disabled = true;
+        btnLoadMore.textContent = "Carregando...";
+        try {
+            await loadResultsPage(nextPageCursor);
+        } catch (error) {
+            showFeedback(error.message, "error");
+        } finally {
+            loadingPage = false;
+            btnLoadMore.disabled = false;
+            btnLoadMore.textContent = "Carregar mais registros";
+        }
+    }
+
+    /**
+     * Busca uma página de resultados em modo streaming (NDJSON) e vai
+     * adicionando as linhas à tabela conforme chegam.
+     * Retorna false se a busca não encontrou registros.
+     */
+    async function loadResultsPage(cursor) {
+        const response = await fetch("/api/buscar", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({
+                query_id: currentQueryId,
+                params: currentSearchParams,
+                stream: true,
+                format: "compact", // Cabeçalhos uma vez, linhas como arrays
+                row_hashes: true,
+                page_size: SEARCH_PAGE_SIZE,
+                cursor: cursor
+            }),
+        });
+
+        if (response.status === 404) {
+            return false;
+        } else if (!response.ok) {
+            const errorData = await response.json();
+            let message = errorData.error || `Erro ${response.status}`;
+            // 429/503: controle de admissão (muitas buscas simultâneas)
+            const retryAfter = response.headers.get("Retry-After");
+            if (retryAfter) message += ` (tente de novo em ${retryAfter}s)`;
+            throw new Error(message);
+        }
+
+        const isFirstPage = (cursor === null);
+        let pendingRows = [];
+
+        await readNdjson(response, (message, lineIndex) => {
+            if (lineIndex === 0) {
+                // 1ª linha: cabeçalhos e regras de update
+                if (isFirstPage) {
+                    currentResultHeaders = message.headers;
+                    // Guarda as regras de update recebidas do servidor
+                    currentQueryData.update_rules = message.update_rules;
+                    displayResults(message.headers);
+                    buildUpdateForm(message.headers, message.update_rules);
+                }
+            } else if (Array.isArray(message)) {
+                pendingRows.push(message);
+            } else if (message.columns) {
+                // Modo colunar: um lote inteiro por linha, uma lista por coluna
+                pendingRows = pendingRows.concat(columnsToRows(message.columns));
+            } else if (message.hashes) {
+                // Hashes do lote anterior, na mesma ordem das linhas
+                appendRows(pendingRows);
+                pendingRows = [];
+                message.hashes.forEach(hash => rowHashes.set(hashTargets.shift(), hash));
+            } else if (message.error) {
+                throw new Error(message.error);
+            } else if (message.done) {
+                nextPageCursor = message.next_cursor;
+                if (message.truncated) {
+                    showFeedback(`Resultado limitado a ${message.max_rows} linhas (max_rows). ` +
+                                 `Refine os filtros para ver o restante.`, "error");
+                }
+            }
+        }, () => {
+            // Ao fim de cada chunk recebido, desenha as linhas acumuladas
+            appendRows(pendingRows);
+            pendingRows = [];
+        });
+
+        btnLoadMore.style.display = nextPageCursor ? "inline-block" : "none";
+        return true;
+    }
+
+    function columnsToRows(columns) {
+        const rowCount = columns.length ? columns[0].length : 0;
+        const rows = new Array(rowCount);
+        for (let r = 0; r < rowCount; r++) {
+            rows[r] = columns.map(column => column[r]);
+        }
+        return rows;
+    }
+
+    async function readNdjson(response, onMessage, onChunk) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let lineIndex = 0;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split("\n");
+            buffer = lines.pop(); // Linha incompleta fica para o próximo chunk
+            for (const line of lines) {
+                if (line) onMessage(JSON.parse(line), lineIndex++);
+            }
+            onChunk();
+        }
+        if (buffer) onMessage(JSON.parse(buffer), lineIndex++);
+        onChunk();
+    }
+
     // --- 3. Evento: Atualizar Dados (Submit do Update) ---
     updateForm.addEventListener("submit", async (e) => {
         e.preventDefault();
@@ -190,24 +313,38 @@ document.addEventListener("DOMContentLoaded", () => {
         btnAtualizar.textContent = "Atualizando...";
 
         try {
+            // Seleções grandes rodam em segundo plano (evita timeout do proxy)
+            const runAsync = selectedRowIDs.length > ASYNC_UPDATE_THRESHOLD;
             const response = await fetch("/api/atualizar", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({
                     query_id: currentQueryId,
                     rowids: selectedRowIDs,
-                    updates: updates
+                    updates: updates,
+                    async: runAsync,
+                    // Linhas alteradas voltam na resposta (sem nova busca)
+                    return_rows: !runAsync,
+                    params: currentSearchParams
                 }),
             });
 
-            const resultData = await response.json();
+            let resultData = await response.json();
             if (!response.ok) {
                 throw new Error(resultData.error || `Erro ${response.status}`);
             }
 
+            if (response.status === 202) {
+                resultData = await waitForJob(resultData.status_url);
+            }
+
             showFeedback(resultData.message, "success");
             updateForm.reset();
-            searchForm.requestSubmit(); // Recarrega os dados
+            if (resultData.rows) {
+                applyRefreshedRows(resultData);
+            } else {
+                await refreshDisplayedRows();
+            }
 
         } catch (error) {
             showFeedback(error.message, "error");
@@ -217,6 +354,79 @@ document.addEventListener("DOMContentLoaded", () => {
         }
     });
 
+    /**
+     * Relê só as linhas exibidas (por ROWID) e atualiza na tabela as que
+     * mudaram. Se o refresh incremental não for possível, refaz a busca.
+     */
+    async function refreshDisplayedRows() {
+        if (rowHashes.size === 0) {
+            searchForm.requestSubmit();
+            return;
+        }
+        try {
+            const response = await fetch("/api/recarregar", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({
+                    query_id: currentQueryId,
+                    params: currentSearchParams,
+                    rows: Object.fromEntries(rowHashes)
+                }),
+            });
+            const result = await response.json();
+            if (!response.ok) throw new Error(result.error || `Erro ${response.status}`);
+            applyRefreshedRows(result);
+        } catch (error) {
+            console.warn("Refresh incremental falhou, refazendo a busca:", error);
+            searchForm.requestSubmit();
+        }
+    }
+
+    /**
+     * Aplica linhas relidas pelo servidor ({rows, hashes, removed}, vindas
+     * de /api/recarregar ou da resposta do update) e limpa a seleção.
+     */
+    function applyRefreshedRows(result) {
+        result.rows.forEach((row, i) => {
+            const index = rowIndexById.get(row[rowidIndex]);
+            if (index === undefined) return;
+            resultRows[index] = row;
+            rowHashes.set(row[rowidIndex], result.hashes[i]);
+        });
+        if (result.removed.length) {
+            const removed = new Set(result.removed);
+            result.removed.forEach(rowid => rowHashes.delete(rowid));
+            resultRows = resultRows.filter(row => !removed.has(row[rowidIndex]));
+            rowIndexById = new Map(resultRows.map((row, i) => [row[rowidIndex], i]));
+        }
+        selectedRowIds.clear();
+        scheduleRender();
+    }
+
+    /**
+     * Acompanha um job de atualização até terminar, mostrando o progresso.
+     * Retorna o estado final (ou lança erro se o job falhou).
+     */
+    async function waitForJob(statusUrl) {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+            const response = await fetch(statusUrl);
+            const job = await response.json();
+            if (!response.ok) {
+                throw new Error(job.error || `Erro ${response.status}`);
+            }
+            if (job.status === "succeeded") {
+                return job;
+            }
+            if (job.status === "failed") {
+                const detail = job.errors.length ? ` Ex: ${job.errors[0].rowid}: ${job.errors[0].error}` : "";
+                throw new Error(`${job.message}${detail}`);
+            }
+            btnAtualizar.textContent =
+                `Atualizando... ${job.rows_processed}/${job.total_rows} (${job.batches_committed} lotes)`;
+        }
+    }
+
     // --- 4. Eventos do Modal ---
     btnShowQueryModal.addEventListener("click", () => {
         queryModal.classList.add("active");
@@ -243,7 +453,8 @@ document.addEventListener("DOMContentLoaded", () => {
             const response = await fetch(`/api/query/${currentQueryId}`, {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ sql: newSql })
+                // A versão carregada evita sobrescrever a edição de outra pessoa (409)
+                body: JSON.stringify({ sql: newSql, version: currentQueryData.version || 0 })
             });
             
             const result = await response.json();
@@ -253,6 +464,7 @@ document.addEventListener("DOMContentLoaded", () => {
             
             // Atualiza a query em memória
             currentQueryData.sql = newSql;
+            currentQueryData.version = result.version;
             alert(result.message); // Sucesso
             queryModal.classList.remove("active");
 
@@ -263,7 +475,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
     // --- Funções Auxiliares (DOM) ---
 
-    function displayResults(headers, rows) {
+    function displayResults(headers) {
         tableContainer.innerHTML = "";
         noResultsDiv.style.display = "none";
         const table = document.createElement("table");
@@ -281,8 +493,8 @@ document.addEventListener("DOMContentLoaded", () => {
         headerRow.appendChild(thCheck);
 
         // Remove 'ROWID' dos cabeçalhos visuais
-        const displayHeaders = headers.filter(h => h.toUpperCase() !== 'ROWID');
-        displayHeaders.forEach(header => {
+        headers.forEach(header => {
+            if (header.toUpperCase() === 'ROWID') return;
             const th = document.createElement("th");
             th.textContent = header;
             headerRow.appendChild(th);
@@ -290,39 +502,137 @@ document.addEventListener("DOMContentLoaded", () => {
         thead.appendChild(headerRow);
         table.appendChild(thead);
 
-        // Corpo
-        const tbody = document.createElement("tbody");
-        rows.forEach(row => {
-            const tr = document.createElement("tr");
-            const tdCheck = document.createElement("td");
-            const checkbox = document.createElement("input");
-            checkbox.type = "checkbox";
-            checkbox.className = "row-selector";
-            checkbox.value = row.ROWID; // O valor é o ROWID
-            tdCheck.appendChild(checkbox);
-            tr.appendChild(tdCheck);
-
-            displayHeaders.forEach(header => {
-                const td = document.createElement("td");
-                let value = row[header];
-                if (header.includes('DATAHORA') && value) {
-                    td.textContent = formatDateTime(value);
-                } else {
-                    td.textContent = (value === null || value === undefined) ? "" : value;
-                }
-                tr.appendChild(td);
-            });
-            tbody.appendChild(tr);
-        });
-        table.appendChild(tbody);
+        // Corpo (só as linhas visíveis; preenchido por renderWindow)
+        tableBody = document.createElement("tbody");
+        resultRows = [];
+        rowIndexById = new Map();
+        selectedRowIds = new Set();
+        rowidIndex = headers.findIndex(h => h.toUpperCase() === 'ROWID');
+        rowHashes = new Map();
+        hashTargets = [];
+        table.appendChild(tableBody);
         tableContainer.appendChild(table);
+        scrollContainer.scrollTop = 0;
 
+        // "Selecionar todos" altera só o Set; o DOM é redesenhado depois
         tableSelectAllCheckbox.addEventListener("change", () => {
-            tableContainer.querySelectorAll('tbody .row-selector')
-                .forEach(cb => cb.checked = tableSelectAllCheckbox.checked);
+            if (tableSelectAllCheckbox.checked) {
+                resultRows.forEach(row => selectedRowIds.add(row[rowidIndex]));
+            } else {
+                selectedRowIds.clear();
+            }
+            scheduleRender();
+        });
+        // Um único listener para os checkboxes de todas as linhas
+        tableBody.addEventListener("change", (e) => {
+            if (!e.target.classList.contains("row-selector")) return;
+            if (e.target.checked) {
+                selectedRowIds.add(e.target.value);
+            } else {
+                selectedRowIds.delete(e.target.value);
+            }
+            updateSelectionInfo();
         });
 
         resultsSection.style.display = "block";
+        updateSelectionInfo();
+    }
+
+    function appendRows(rows) {
+        if (rows.length === 0) return;
+        rows.forEach(row => {
+            rowIndexById.set(row[rowidIndex], resultRows.length);
+            resultRows.push(row);
+            hashTargets.push(row[rowidIndex]);
+        });
+        scheduleRender();
+    }
+
+    scrollContainer.addEventListener("scroll", scheduleRender);
+
+    function scheduleRender() {
+        if (renderScheduled) return;
+        renderScheduled = true;
+        requestAnimationFrame(() => {
+            renderScheduled = false;
+            renderWindow();
+        });
+    }
+
+    /**
+     * Desenha apenas as linhas dentro da área visível (mais uma margem),
+     * com linhas "espaçadoras" acima e abaixo para manter a barra de rolagem.
+     */
+    function renderWindow() {
+        if (!tableBody) return;
+        const height = rowHeight || DEFAULT_ROW_HEIGHT;
+        const visibleCount = Math.ceil(scrollContainer.clientHeight / height) || 20;
+        let first = Math.max(0, Math.floor(scrollContainer.scrollTop / height) - OVERSCAN_ROWS);
+        first -= first % 2; // Início sempre par: mantém o zebrado (nth-child) estável
+        const last = Math.min(resultRows.length, first + visibleCount + 2 * OVERSCAN_ROWS);
+
+        const fragment = document.createDocumentFragment();
+        fragment.appendChild(spacerRow(first * height));
+        for (let i = first; i < last; i++) {
+            const tr = document.createElement("tr");
+            fillRow(tr, resultRows[i]);
+            fragment.appendChild(tr);
+        }
+        fragment.appendChild(spacerRow((resultRows.length - last) * height));
+        tableBody.replaceChildren(fragment);
+
+        // Mede a altura real de uma linha uma única vez
+        if (!rowHeight && last > first) {
+            rowHeight = tableBody.children[1].offsetHeight || DEFAULT_ROW_HEIGHT;
+            if (rowHeight !== height) scheduleRender();
+        }
+        updateSelectionInfo();
+
+        // Rolagem perto do fim: busca a próxima página automaticamente
+        if (nextPageCursor && resultRows.length - last < PREFETCH_ROWS) {
+            loadNextPage();
+        }
+    }
+
+    function spacerRow(heightPx) {
+        const tr = document.createElement("tr");
+        tr.className = "spacer-row";
+        tr.style.height = `${heightPx}px`;
+        if (heightPx === 0) tr.style.display = "none";
+        return tr;
+    }
+
+    function updateSelectionInfo() {
+        const selected = selectedRowIds.size;
+        tableSelectAllCheckbox.checked = selected > 0 && selected === resultRows.length;
+        tableSelectAllCheckbox.indeterminate = selected > 0 && selected < resultRows.length;
+        selectionInfo.textContent = `${resultRows.length} linhas carregadas, ${selected} selecionadas`;
+    }
+
+    function fillRow(tr, row) {
+        const rowid = row[rowidIndex];
+        const tdCheck = document.createElement("td");
+        const checkbox = document.createElement("input");
+        checkbox.type = "checkbox";
+        checkbox.className = "row-selector";
+        checkbox.value = rowid; // O valor é o ROWID
+        checkbox.checked = selectedRowIds.has(rowid);
+        tdCheck.appendChild(checkbox);
+        tr.appendChild(tdCheck);
+
+        currentResultHeaders.forEach((header, i) => {
+            if (i === rowidIndex) return;
+            const td = document.createElement("td");
+            let value = row[i];
+            if (header.includes('DATAHORA') && value) {
+                td.textContent = formatDateTime(value);
+            } else {
+                td.textContent = (value === null || value === undefined) ? "" : value;
+            }
+            // Linhas têm altura fixa: o texto completo fica no tooltip
+            td.title = td.textContent;
+            tr.appendChild(td);
+        });
     }
 
     function buildUpdateForm(headers, updateRules) {
@@ -361,20 +671,25 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     function getSelectedRowIDs() {
-        const selected = tableContainer.querySelectorAll('tbody .row-selector:checked');
-        return Array.from(selected).map(cb => cb.value);
+        return Array.from(selectedRowIds);
     }
 
     function hideResults() {
         resultsSection.style.display = "none";
         updateSection.style.display = "none";
+        btnLoadMore.style.display = "none";
         tableContainer.innerHTML = "";
+        tableBody = null;
+        nextPageCursor = null;
     }
 
     function showNoResults() {
         resultsSection.style.display = "block";
         updateSection.style.display = "none";
+        btnLoadMore.style.display = "none";
         tableContainer.innerHTML = "";
+        tableBody = null;
+        selectionInfo.textContent = "";
         noResultsDiv.style.display = "block";
     }
 
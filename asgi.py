@@ -0,0 +1,7 @@
+from app import create_app
+from app.aio import create_asgi_app
+
+# Modo assíncrono: /api/buscar e /api/atualizar rodam no event loop com o
+# driver asyncio do oracledb; as demais rotas são repassadas ao Flask.
+# Execute com: uvicorn asgi:app --host 0.0.0.0 --port 5000
+app = create_asgi_app(create_app())
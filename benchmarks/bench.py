@@ -0,0 +1,229 @@
+"""
+Benchmark de throughput do gerenciador de queries.
+
+Executa cenários contra um backend plugável ('fake' = Oracle simulado com
+latência por round-trip, 'oracle' = banco real configurado no .env) e
+imprime um JSON com p50/p99, linhas/s e pico de memória (RSS) por cenário.
+
+Exemplos:
+    python benchmarks/bench.py
+    python benchmarks/bench.py --rows 20000 --cols 30 --latency-ms 2 --concurrency 16
+    python benchmarks/bench.py --scenario http_search --output bench_output.txt
+    python benchmarks/bench.py --rows 50000 --scenario query --scenario query_tuned \
+        --scenario http_search_raw --scenario http_search
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = [
+    "query",         # db.execute_dynamic_query (resultado completo)
+    "query_paged",   # db.execute_dynamic_query com page_size
+    "query_tuned",   # 'query' com "expected_rows" da query (arraysize/prefetch do tamanho do resultado)
+    "update",        # db.execute_dynamic_update em todas as linhas
+    "http_search",   # POST /api/buscar pelo test client do Flask
+    "http_search_raw", # http_search sem o json_output_type_handler (tipos padrão do driver)
+    "http_stream",   # POST /api/buscar com stream=true (NDJSON)
+    "http_columnar", # http_search com "fetch_mode": "columnar" (requer pyarrow)
+    "http_update",   # POST /api/atualizar pelo test client do Flask
+    "concurrent",    # http_search com N clientes simultâneos
+]
+
+BENCH_QUERY_ID = "update_user_profile"
+BENCH_PARAMS = {"user_email": "bench@example.com"}
+
+def _setup_backend(args):
+    """Prepara o ambiente e injeta o pool do backend escolhido em app/db.py."""
+    if args.backend == "fake":
+        # O Config exige as variáveis do banco mesmo sem conexão real
+        for name in ("DB_USER", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_SERVICE", "DB_ROLE_PASSWORD"):
+            os.environ.setdefault(name, "bench")
+    # Mede o caminho do banco, não o cache de resultados (a menos que pedido)
+    if not args.cache:
+        os.environ["RESULT_CACHE_TTL"] = "0"
+    os.environ.setdefault("SLOW_QUERY_SECONDS", "0")
+    os.chdir(ROOT)
+
+    from app import db
+
+    if args.backend == "fake":
+        from benchmarks.fake_oracle import FakeDatabase, FakePool
+        database = FakeDatabase(rows=args.rows, cols=args.cols, width=args.width,
+                                latency_ms=args.latency_ms, connect_ms=args.connect_ms)
+        db._pool = FakePool(database, max=args.pool_max)
+        return database
+    return None
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def _peak_rss_mb():
+    # ru_maxrss: KB no Linux, bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+def _timed(fn, iterations):
+    latencies = []
+    rows = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows += fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies, rows
+
+def run_scenario(name, args):
+    database = _setup_backend(args)
+    from app import create_app, db
+    from app.core import query_manager
+
+    query_obj = query_manager.get_query_by_id(BENCH_QUERY_ID)
+    flask_app = create_app()
+    client = flask_app.test_client()
+    rowids = [f"AAAR{r:014d}" for r in range(args.rows)]
+    updates = {"USERNAME": "bench"}
+
+    def query():
+        return len(db.execute_dynamic_query(query_obj["sql"], BENCH_PARAMS)["rows"])
+
+    def query_tuned():
+        fetch_options = db.query_fetch_options(dict(query_obj, expected_rows=args.rows))
+        return len(db.execute_dynamic_query(query_obj["sql"], BENCH_PARAMS, fetch_options=fetch_options)["rows"])
+
+    def query_paged():
+        return len(db.execute_dynamic_query(query_obj["sql"], BENCH_PARAMS, args.page_size, 0)["rows"])
+
+    def update():
+        result = db.execute_dynamic_update(query_obj["target_table"], rowids, updates,
+                                           query_obj["update_rules"], args.batch_size)
+        return result["updated_count"]
+
+    def http_search():
+        response = client.post("/api/buscar", json={"query_id": BENCH_QUERY_ID, "params": BENCH_PARAMS})
+        return len(response.get_json()["rows"])
+
+    def http_search_raw():
+        db.json_output_type_handler = lambda cursor, metadata: None
+        return http_search()
+
+    def http_columnar():
+        query_obj["fetch_mode"] = "columnar"
+        response = client.post("/api/buscar", json={"query_id": BENCH_QUERY_ID, "params": BENCH_PARAMS})
+        return response.get_json()["row_count"]
+
+    def http_stream():
+        response = client.post("/api/buscar", json={"query_id": BENCH_QUERY_ID, "params": BENCH_PARAMS,
+                                                     "stream": True})
+        return sum(1 for line in response.get_data().splitlines() if line.startswith(b"["))
+
+    def http_update():
+        response = client.post("/api/atualizar", json={"query_id": BENCH_QUERY_ID, "rowids": rowids,
+                                                       "updates": updates})
+        return response.get_json()["updated_count"]
+
+    operations = {
+        "query": query, "query_paged": query_paged, "query_tuned": query_tuned, "update": update,
+        "http_search": http_search, "http_search_raw": http_search_raw, "http_stream": http_stream,
+        "http_columnar": http_columnar, "http_update": http_update,
+    }
+
+    # Aquecimento: cria as sessões do pool e compila os templates
+    (operations.get(name) or http_search)()
+    round_trips_before = database.round_trips if database else 0
+
+    start = time.perf_counter()
+    if name == "concurrent":
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            futures = [executor.submit(_timed, http_search, 1) for _ in range(args.iterations * args.concurrency)]
+            results = [f.result() for f in futures]
+        latencies = [lat for lats, _ in results for lat in lats]
+        rows = sum(r for _, r in results)
+    else:
+        latencies, rows = _timed(operations[name], args.iterations)
+    wall = time.perf_counter() - start
+
+    report = {
+        "scenario": name,
+        "requests": len(latencies),
+        "rows": rows,
+        "wall_seconds": round(wall, 4),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "rows_per_second": round(rows / wall, 1) if wall else 0.0,
+        "requests_per_second": round(len(latencies) / wall, 2) if wall else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if database:
+        report["round_trips"] = database.round_trips - round_trips_before
+    return report
+
+def _scenario_args(args):
+    """Repassa os parâmetros do benchmark para o subprocesso de um cenário."""
+    forwarded = []
+    for key, value in sorted(vars(args).items()):
+        if key in ("scenario", "output", "in_process"):
+            continue
+        flag = "--" + key.replace("_", "-")
+        if isinstance(value, bool):
+            if value:
+                forwarded.append(flag)
+        else:
+            forwarded += [flag, str(value)]
+    return forwarded
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de busca/update do gerenciador de queries.")
+    parser.add_argument("--backend", choices=["fake", "oracle"], default="fake",
+                        help="'fake' = Oracle simulado (padrão), 'oracle' = banco real do .env")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                        help="Cenário a executar (pode repetir). Padrão: todos.")
+    parser.add_argument("--rows", type=int, default=5000, help="Linhas retornadas pela busca")
+    parser.add_argument("--cols", type=int, default=12, help="Colunas por linha (inclui ROWID)")
+    parser.add_argument("--width", type=int, default=20, help="Largura das colunas de texto")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Latência simulada por round-trip")
+    parser.add_argument("--connect-ms", type=float, default=20.0, help="Custo simulado de abrir uma sessão")
+    parser.add_argument("--iterations", type=int, default=20, help="Requisições por cenário (por cliente)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultâneos no cenário 'concurrent'")
+    parser.add_argument("--pool-max", type=int, default=8, help="Sessões máximas do pool simulado")
+    parser.add_argument("--page-size", type=int, default=500, help="page_size do cenário 'query_paged'")
+    parser.add_argument("--batch-size", type=int, default=500, help="Lote do array DML no cenário 'update'")
+    parser.add_argument("--cache", action="store_true", help="Mantém o cache de resultados ligado")
+    parser.add_argument("--output", help="Arquivo para gravar o JSON (além da saída padrão)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Roda tudo no mesmo processo (o RSS deixa de ser por cenário)")
+    args = parser.parse_args()
+
+    scenarios = args.scenario or SCENARIOS
+    reports = []
+    for name in scenarios:
+        if args.in_process or len(scenarios) == 1:
+            reports.append(run_scenario(name, args))
+        else:
+            # Um processo por cenário: o pico de RSS não contamina o próximo
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), "--scenario", name] + _scenario_args(args)
+            )
+            reports.append(json.loads(output)["scenarios"][0])
+
+    result = {"backend": args.backend, "parameters": {k: v for k, v in vars(args).items()
+                                                      if k not in ("scenario", "output")},
+              "scenarios": reports}
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
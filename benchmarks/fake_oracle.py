@@ -0,0 +1,226 @@
+"""
+Substituto local do Oracle para os benchmarks.
+
+Imita a parte da API do 'oracledb' usada por app/db.py (pool, cursor,
+arraysize/prefetchrows, outputtypehandler, executemany com
+batcherrors/arraydmlrowcounts) e simula a latência de rede: cada round-trip
+ao "servidor" custa 'latency_ms'. Assim diferenças de pooling, lotes e
+fetch aparecem nos números.
+"""
+import datetime
+import threading
+import time
+
+import oracledb
+
+class FakeDatabase:
+    """Tabela sintética de 'rows' linhas x 'cols' colunas de largura 'width'."""
+
+    def __init__(self, rows=1000, cols=10, width=20, latency_ms=1.0, connect_ms=20.0):
+        self.latency = latency_ms / 1000.0
+        self.connect_latency = connect_ms / 1000.0
+        self.round_trips = 0
+        self._lock = threading.Lock()
+        # Mesmo formato do 'cursor.description' do oracledb (nome, tipo, ..., precisão, escala, nulo)
+        kinds = [(oracledb.DB_TYPE_NUMBER, 10, 0), (oracledb.DB_TYPE_VARCHAR, None, None),
+                 (oracledb.DB_TYPE_NUMBER, 12, 2), (oracledb.DB_TYPE_DATE, None, None)]
+        self.description = [("ROWID", oracledb.DB_TYPE_ROWID, None, None, None, None, False)]
+        for i in range(cols - 1):
+            type_code, precision, scale = kinds[i % 4]
+            self.description.append((f"COL_{i:02d}", type_code, width, width, precision, scale, True))
+        base = datetime.datetime(2024, 1, 1)
+        self.rows = []
+        for r in range(rows):
+            row = [f"AAAR{r:014d}"]
+            for c in range(cols - 1):
+                kind = c % 4
+                if kind == 0:
+                    row.append(r * 10 + c)
+                elif kind == 1:
+                    row.append(f"{r:0{width}d}"[:width])
+                elif kind == 2:
+                    # NUMBER com escala: o oracledb devolve float por padrão
+                    # (Decimal só com defaults.fetch_decimals)
+                    row.append(r / 100)
+                else:
+                    row.append(base + datetime.timedelta(minutes=r))
+            self.rows.append(tuple(row))
+
+    def round_trip(self, cost=1):
+        with self._lock:
+            self.round_trips += cost
+        if self.latency:
+            time.sleep(self.latency * cost)
+
+# Conversões feitas pelo "servidor" quando o cliente define a coluna com outro tipo
+_SERVER_CONVERSIONS = {
+    oracledb.DB_TYPE_BINARY_DOUBLE: float,
+    str: str,
+}
+
+def _converter(var):
+    """Conversão de uma coluna definida pelo outputtypehandler (None = nenhuma)."""
+    if var is None:
+        return None
+    server = _SERVER_CONVERSIONS.get(var.type)
+    client = var.outconverter
+    if server and client:
+        return lambda value: client(server(value))
+    return server or client
+
+def convert_rows(rows, variables):
+    """
+    Aplica as conversões pedidas pelo outputtypehandler às linhas lidas.
+    Feita a cada execução, como no driver: o custo aparece nos benchmarks.
+    """
+    converters = [_converter(v) for v in variables]
+    if not any(converters):
+        return rows
+    return [
+        tuple(conv(v) if conv and v is not None else v for conv, v in zip(converters, row))
+        for row in rows
+    ]
+
+class FakeFetchInfo:
+    """Metadados de coluna passados ao outputtypehandler (como oracledb.FetchInfo)."""
+
+    def __init__(self, description):
+        self.name, self.type_code, _, _, self.precision, self.scale, self.null_ok = description
+
+class FakeVar:
+    def __init__(self, type, outconverter=None):
+        self.type = type
+        self.outconverter = outconverter
+
+class FakeBatchError:
+    def __init__(self, offset, message):
+        self.offset = offset
+        self.message = message
+
+class FakeCursor:
+    def __init__(self, database):
+        self.db = database
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.description = None
+        self._pending = []
+        self._buffer = []
+        self._rowcounts = []
+        self._errors = []
+        self.outputtypehandler = None
+
+    def execute(self, sql, binds=None):
+        binds = binds or {}
+        self.db.round_trip()
+        if sql.lstrip().upper().startswith("SELECT"):
+            offset = binds.get("p_offset", 0)
+            limit = binds.get("p_fetch", len(self.db.rows))
+            self.description = self.db.description
+            source = self.db.rows
+            rowids = {v for k, v in binds.items() if k.startswith("p_rid_")}
+            if rowids:
+                # Refresh por ROWID (WHERE rowid IN (...))
+                self._pending = [row for row in source if row[0] in rowids]
+            else:
+                # Teto (FETCH FIRST :p_max_rows) aplicado antes da paginação
+                capped = source[:binds.get("p_max_rows", len(source))]
+                self._pending = capped[offset:offset + limit]
+            if self.outputtypehandler is not None:
+                variables = [self.outputtypehandler(self, FakeFetchInfo(d)) for d in self.description]
+                self._pending = convert_rows(self._pending, variables)
+            # As primeiras 'prefetchrows' linhas chegam no mesmo round-trip
+            self._buffer = self._pending[:self.prefetchrows]
+            self._pending = self._pending[self.prefetchrows:]
+        else:
+            self.description = None
+
+    def var(self, type, arraysize=None, outconverter=None, **kwargs):
+        return FakeVar(type, outconverter)
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        if len(self._buffer) < size and self._pending:
+            self.db.round_trip()
+            take = max(size - len(self._buffer), self.arraysize)
+            self._buffer += self._pending[:take]
+            self._pending = self._pending[take:]
+        rows, self._buffer = self._buffer[:size], self._buffer[size:]
+        return rows
+
+    def fetchall(self):
+        rows = []
+        while True:
+            batch = self.fetchmany()
+            if not batch:
+                return rows
+            rows.extend(batch)
+
+    def executemany(self, sql, binds, batcherrors=False, arraydmlrowcounts=False):
+        # Array DML: o lote inteiro em um único round-trip
+        self.db.round_trip()
+        self._rowcounts = [1] * len(binds)
+        self._errors = []
+
+    def getbatcherrors(self):
+        return self._errors
+
+    def getarraydmlrowcounts(self):
+        return self._rowcounts
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self):
+        return FakeCursor(self.pool.db)
+
+    def commit(self):
+        self.pool.db.round_trip()
+
+    def rollback(self):
+        self.pool.db.round_trip()
+
+    def close(self):
+        self.pool.release(self)
+
+class FakePool:
+    """
+    Pool com no máximo 'max' sessões. Criar uma sessão custa 'connect_ms'
+    (login + SET ROLE), reaproveitar uma sessão livre não custa nada.
+    """
+
+    def __init__(self, database, max=8):
+        self.db = database
+        self.min = 0
+        self.max = max
+        self.increment = 1
+        self.ping_interval = 60
+        self.wait_timeout = 0
+        self.stmtcachesize = 20
+        self.opened = 0
+        self.busy = 0
+        self._idle = []
+        self._slots = threading.Semaphore(max)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            self.busy += 1
+            if self._idle:
+                return self._idle.pop()
+            self.opened += 1
+        time.sleep(self.db.connect_latency)
+        return FakeConnection(self)
+
+    def release(self, connection):
+        with self._lock:
+            self.busy -= 1
+            self._idle.append(connection)
+        self._slots.release()
+
+    def close(self, force=False):
+        pass
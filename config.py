@@ -15,4 +15,87 @@ class Config:
     if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_SERVICE]):
         raise ValueError("ERRO: Defina todas as variáveis de banco de dados no arquivo .env")
 
-    DB_DSN = f"{DB_HOST}:{DB_PORT}/{DB_SERVICE}"
\ No newline at end of file
+    DB_DSN = f"{DB_HOST}:{DB_PORT}/{DB_SERVICE}"
+
+    # --- Pool de Sessões Oracle ---
+    # Sessões são criadas sob demanda (de MIN até MAX, de INCREMENT em INCREMENT)
+    DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+    DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 8))
+    DB_POOL_INCREMENT = int(os.environ.get('DB_POOL_INCREMENT', 1))
+    # Segundos sem uso após os quais a sessão é "pingada" antes de ser entregue
+    # (0 = sempre verificar, -1 = nunca verificar)
+    DB_POOL_PING_INTERVAL = int(os.environ.get('DB_POOL_PING_INTERVAL', 60))
+    # Segundos máximos aguardando uma sessão livre quando o pool está cheio
+    DB_POOL_WAIT_TIMEOUT = int(os.environ.get('DB_POOL_WAIT_TIMEOUT', 10))
+    # Statements em cache por sessão (0 = calcular pelas variantes do catálogo)
+    DB_STMT_CACHE_SIZE = int(os.environ.get('DB_STMT_CACHE_SIZE', 0))
+
+    # --- Leitura de resultados ---
+    # Linhas buscadas por round-trip (arraysize/prefetchrows do cursor)
+    DB_FETCH_ARRAYSIZE = int(os.environ.get('DB_FETCH_ARRAYSIZE', 1000))
+    # Limite do arraysize/prefetch pedido por query ("arraysize", "expected_rows"...)
+    DB_FETCH_MAX_ARRAYSIZE = int(os.environ.get('DB_FETCH_MAX_ARRAYSIZE', 10000))
+    # Tamanho de página usado pela tela / máximo aceito em /api/buscar
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 500))
+    SEARCH_MAX_PAGE_SIZE = int(os.environ.get('SEARCH_MAX_PAGE_SIZE', 5000))
+    # Teto de linhas por busca/exportação (0 = sem teto; "max_rows" no
+    # queries.json sobrepõe para uma query específica)
+    SEARCH_MAX_ROWS = int(os.environ.get('SEARCH_MAX_ROWS', 0))
+
+    # --- Controle de admissão (buscas simultâneas no banco) ---
+    # Buscas rodando ao mesmo tempo em cada processo (0 = sem limite global);
+    # "max_concurrent" no queries.json limita uma query específica
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 0))
+    # Buscas aguardando vaga (acima disso: 429) e espera máxima em s (depois: 503)
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 20))
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 15))
+
+    # --- Cache de resultados de /api/buscar ---
+    # Validade em segundos (0 = cache desligado), memória máxima e nº de entradas
+    RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 30))
+    RESULT_CACHE_MAX_MB = int(os.environ.get('RESULT_CACHE_MAX_MB', 64))
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 256))
+
+    # --- Métricas ---
+    # Requisições acima deste tempo (s) vão para o slow-query log (0 = desligado)
+    SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 2.0))
+
+    # --- Jobs em segundo plano (/api/atualizar com "async": true) ---
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 20))
+    # Segundos que um job finalizado continua consultável em /api/jobs/<id>
+    JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 3600))
+    # 0 = "async": true roda o UPDATE na própria requisição (desligado
+    # automaticamente com SERVER_WORKERS > 1: jobs só existem no processo que os criou)
+    JOB_ASYNC_UPDATES = os.environ.get('JOB_ASYNC_UPDATES', '1') == '1'
+
+    # --- Modo assíncrono (asgi.py) ---
+    # Tempo máximo (s) de cada chamada ao banco antes de cancelar a operação
+    ASYNC_REQUEST_TIMEOUT = int(os.environ.get('ASYNC_REQUEST_TIMEOUT', 120))
+
+    # --- UPDATE em lote (array DML) ---
+    # Quantidade de ROWIDs enviados por round-trip no executemany
+    DB_UPDATE_BATCH_SIZE = int(os.environ.get('DB_UPDATE_BATCH_SIZE', 500))
+    # --- Exportação (/api/export/<query_id>) ---
+    # Separador do CSV e linhas por row group do Parquet (limita a memória)
+    EXPORT_CSV_DELIMITER = os.environ.get('EXPORT_CSV_DELIMITER', ',')
+    EXPORT_ROW_GROUP_SIZE = int(os.environ.get('EXPORT_ROW_GROUP_SIZE', 50000))
+
+    # --- Compressão das respostas (gzip / brotli, pelo Accept-Encoding) ---
+    # Respostas menores que isto (bytes) não são comprimidas; streams sempre são
+    COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    # Brotli exige o pacote opcional 'brotli'
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+
+    # --- Servidor de produção (gunicorn.conf.py / serve.py) ---
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:5000')
+    # Processos (cada um com o próprio pool de até DB_POOL_MAX sessões).
+    # Cache de resultados, jobs, admissão e /metrics são por processo: com
+    # mais de um worker o cache e os jobs assíncronos são desligados
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 1))
+    # Threads por processo; acima de DB_POOL_MAX as requisições esperam por sessão
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 8))
+    # Segundos máximos por requisição e para terminar as em andamento ao desligar
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 120))
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))
@@ -0,0 +1,32 @@
+# Servidor de produção (Linux): gunicorn -c gunicorn.conf.py
+# Vários processos com threads, app carregado uma vez no mestre e um pool
+# de sessões Oracle aberto em cada worker logo após o fork.
+from config import Config
+
+wsgi_app = "wsgi:app"
+bind = Config.SERVER_BIND
+workers = Config.SERVER_WORKERS
+threads = Config.SERVER_THREADS
+worker_class = "gthread"
+preload_app = True
+timeout = Config.SERVER_TIMEOUT
+graceful_timeout = Config.SERVER_GRACEFUL_TIMEOUT
+
+# Cache de resultados e jobs vivem na memória de cada worker: com mais de
+# um, a invalidação e o /api/jobs/<id> não enxergam os outros processos.
+# Ajustado antes de carregar o app, que cria esses singletons a partir do Config.
+if workers > 1:
+    Config.RESULT_CACHE_TTL = 0
+    Config.JOB_ASYNC_UPDATES = False
+
+def when_ready(server):
+    import wsgi
+    print(wsgi.sizing_report(server.cfg.workers, server.cfg.threads, ", ".join(server.cfg.bind)))
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.warm_worker()
+
+def worker_exit(server, worker):
+    import wsgi
+    wsgi.shutdown_worker()
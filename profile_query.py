@@ -0,0 +1,112 @@
+"""
+Perfil de uma query do catálogo (queries.json) pela linha de comando.
+
+Gera o plano (EXPLAIN PLAN + DBMS_XPLAN) com os filtros informados e,
+com --analisar, executa a query para medir tempo, leituras lógicas e
+round-trips. O perfil é gravado em queries_profiles.json e comparado
+com o da versão anterior do SQL.
+
+Exemplos:
+    python profile_query.py update_user_profile -p user_email=joao@exemplo.com
+    python profile_query.py adjust_inventory -p product_id=SKU-1 --analisar
+    python profile_query.py adjust_inventory --historico
+"""
+import argparse
+import sys
+
+from app import db
+from app.core import query_manager
+
+def print_profile(profile, comparison):
+    print(f"SQL (hash {profile['sql_hash']}):\n{profile['sql']}\n")
+    print("--- PLANO (EXPLAIN PLAN) ---")
+    print("\n".join(profile["plan"]))
+
+    if profile.get("runtime_plan"):
+        print("\n--- PLANO REAL (DISPLAY_CURSOR, ALLSTATS LAST) ---")
+        print("\n".join(profile["runtime_plan"]))
+    if profile.get("runtime_plan_error"):
+        print(f"\nAVISO: plano real indisponível: {profile['runtime_plan_error']}")
+
+    print("\n--- MÉTRICAS ---")
+    print(f"{'explain_seconds':<20} {profile['explain_seconds']}")
+    if profile["analyze"]:
+        print(f"{'elapsed_seconds':<20} {profile['elapsed_seconds']}")
+        print(f"{'rows':<20} {profile['rows']}")
+        for name, value in (profile.get("session_stats") or {}).items():
+            print(f"{name:<20} {value}")
+        if profile.get("stats_error"):
+            print(f"AVISO: estatísticas da sessão indisponíveis: {profile['stats_error']}")
+
+    if comparison:
+        print(f"\n--- COMPARAÇÃO COM A VERSÃO {comparison['baseline_sql_hash']} "
+              f"({comparison['baseline_profiled_at']}) ---")
+        for name, values in comparison["metrics"].items():
+            change = "-" if values["change_pct"] is None else f"{values['change_pct']:+.1f}%"
+            print(f"{name:<20} {values['baseline']} -> {values['current']} ({change})")
+
+def print_history(query_id):
+    profiles = query_manager.get_query_profiles(query_id)
+    if not profiles:
+        print(f"Nenhum perfil gravado para '{query_id}'.")
+        return
+    print(f"{'DATA':<20} {'SQL':<13} {'MODO':<9} {'EXPLAIN(s)':>10} {'TEMPO(s)':>10} {'LEITURAS':>12} {'ROUND-TRIPS':>12}")
+    for p in profiles:
+        stats = p.get("session_stats") or {}
+        print(f"{p['profiled_at']:<20} {p['sql_hash']:<13} {'analyze' if p['analyze'] else 'explain':<9} "
+              f"{p['explain_seconds']:>10} {p.get('elapsed_seconds', '-'):>10} "
+              f"{stats.get('logical_reads', '-'):>12} {stats.get('round_trips', '-'):>12}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Plano de execução e estatísticas de uma query do catálogo.")
+    parser.add_argument("query_id", help="ID da query no queries.json")
+    parser.add_argument("-p", "--param", action="append", default=[], metavar="BIND=VALOR",
+                        help="Valor de um parâmetro (repita para cada bind)")
+    parser.add_argument("--analisar", action="store_true",
+                        help="Executa a query e mede tempo, leituras lógicas e round-trips")
+    parser.add_argument("--nao-gravar", action="store_true",
+                        help="Não grava o perfil em queries_profiles.json")
+    parser.add_argument("--historico", action="store_true",
+                        help="Só lista os perfis já gravados da query")
+    args = parser.parse_args()
+
+    if args.historico:
+        print_history(args.query_id)
+        return
+
+    query_obj = query_manager.get_query_by_id(args.query_id)
+    if not query_obj:
+        print(f"ERRO: Query '{args.query_id}' não encontrada.")
+        sys.exit(1)
+
+    params = {}
+    for item in args.param:
+        name, sep, value = item.partition("=")
+        if not sep:
+            print(f"ERRO: Parâmetro inválido '{item}' (use BIND=VALOR).")
+            sys.exit(1)
+        params[name.strip()] = value
+
+    missing = query_manager.get_missing_required_params(query_obj, params)
+    if missing:
+        print(f"ERRO: Parâmetros obrigatórios não informados: {', '.join(missing)}")
+        sys.exit(1)
+
+    try:
+        profile = db.profile_query(query_obj["sql"], params, args.analisar)
+    except Exception as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
+    finally:
+        db.close_pool()
+
+    comparison = None
+    if args.nao_gravar:
+        profile = dict(profile, sql_hash=query_manager.sql_hash(query_obj["sql"]))
+    else:
+        profile, baseline = query_manager.save_query_profile(args.query_id, query_obj["sql"], params, profile)
+        comparison = query_manager.compare_profiles(profile, baseline)
+    print_profile(profile, comparison)
+
+if __name__ == "__main__":
+    main()
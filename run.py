@@ -5,5 +5,5 @@ app = create_app()
 if __name__ == "__main__":
     # O 'debug=True' reinicia o servidor automaticamente
     # quando você salva uma alteração no código.
-    # NUNCA use debug=True em produção.
+    # NUNCA use debug=True em produção (use gunicorn.conf.py ou serve.py).
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
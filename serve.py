@@ -0,0 +1,24 @@
+import signal
+import sys
+
+from waitress import serve
+
+import wsgi
+from config import Config
+
+# Servidor de produção sem gunicorn (ex: Windows): waitress, um único
+# processo com SERVER_THREADS threads. Execute com: python serve.py
+
+def main():
+    print(wsgi.sizing_report(1, Config.SERVER_THREADS))
+    wsgi.warm_worker()
+
+    # SIGTERM (ex: serviço parado) passa pelo mesmo desligamento do Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        serve(wsgi.app, listen=Config.SERVER_BIND, threads=Config.SERVER_THREADS)
+    finally:
+        wsgi.shutdown_worker()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 import oracledb
 import sys
 import argparse
+import csv
+import heapq
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 
 # ---  CONFIGURE SEUS DADOS DE CONEXÃO AQUI ---
 DB_USER = "OPECIT"
@@ -32,7 +39,7 @@ begin
 end;
 """
 # A query de SELECT precisa ter 'a.rowid' como a PRIMEIRA coluna
-query_select = """
+query_select_base = """
 SELECT a.rowid, a.OPE_COD_OPERADORA, e.EQU_NUM_SERIE, v.VEI_COD_VEICULO_EXTERNO, 
        a.VIA_DATAHORA_INICIO_OPERACAO, a.VIA_DATAHORA_FINAL_OPERACAO, 
          a.VIA_CATRACA_INICIAL, a.VIA_CATRACA_FINAL,
@@ -41,29 +48,472 @@ FROM ro_viagens a, equipamentos e, veiculos v, linhas l
 WHERE
     e.equ_cod_equipamento = a.equ_cod_equipamento AND
     v.vei_cod_veiculo = a.vei_cod_veiculo AND
-    l.LIN_COD_LINHA = a.LIN_COD_LINHA AND
+    l.LIN_COD_LINHA = a.LIN_COD_LINHA"""
+query_select = query_select_base + """ AND
     a.rop_data_coleta = TO_DATE(:data_coleta, 'DD/MM/YYYY') AND
     v.vei_cod_veiculo_externo = :veic_externo
 """
+ORDER_COLUMN = "VIA_DATAHORA_INICIO_OPERACAO"
+
+# --- MODO LOTE (--arquivo) ---
+# Busca os ROWIDs de vários veículos de uma mesma data em uma única query.
+# A lista IN tem tamanho fixo (completada com o último valor): o texto SQL
+# é sempre o mesmo e o Oracle reaproveita o plano.
+LOOKUP_IN_SIZE = 500
+query_lookup = """
+SELECT a.rowid, v.VEI_COD_VEICULO_EXTERNO, e.EQU_NUM_SERIE
+FROM ro_viagens a, equipamentos e, veiculos v, linhas l
+WHERE
+    e.equ_cod_equipamento = a.equ_cod_equipamento AND
+    v.vei_cod_veiculo = a.vei_cod_veiculo AND
+    l.LIN_COD_LINHA = a.LIN_COD_LINHA AND
+    a.rop_data_coleta = TO_DATE(:data_coleta, 'DD/MM/YYYY') AND
+    v.vei_cod_veiculo_externo IN ({veiculos})
+"""
+KEY_FIELDS = ("data_coleta", "veic_externo", "ccit")
+
+def connect():
+    """Abre a conexão e ativa a ROLE."""
+    print(f"Conectando ao banco de dados em {DB_DSN}...")
+    connection = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=DB_DSN)
+    cursor = connection.cursor()
+    print("Conexão bem-sucedida!")
+
+    print("Definindo a ROLE...")
+    cursor.execute(plsql_set_role)
+    cursor.close()
+    print("ROLE definida com sucesso.")
+    return connection
+
+def build_update_sql(columns):
+    """UPDATE por ROWID para as colunas informadas (já validadas na lista de permissão)."""
+    set_clauses = [
+        ALLOWED_UPDATE_COLUMNS[col].replace(":val_name", f":update_val_{i}")
+        for i, col in enumerate(columns)
+    ]
+    return f"UPDATE ro_viagens SET {', '.join(set_clauses)} WHERE rowid = :p_rowid"
+
+def read_input_file(path):
+    """
+    Lê o CSV (cabeçalho: data_coleta, veic_externo, ccit e colunas a alterar)
+    ou JSONL ({"data_coleta", "veic_externo", "ccit", "updates": {...}} ou com
+    as colunas no próprio objeto). Gera (nº da linha, chave, alterações).
+    Células vazias não alteram a coluna.
+    """
+    def clean(values):
+        return {k.strip(): ("" if v is None else str(v).strip()) for k, v in values.items()}
+
+    def split(line_no, record):
+        updates = record.pop("updates", None)
+        record = clean(record)
+        key = tuple(record.pop(field, "") for field in KEY_FIELDS)
+        updates = record if updates is None else clean(updates)
+        return line_no, key, {k.upper(): v for k, v in updates.items() if v != ""}
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield split(line_no, json.loads(line))
+        else:
+            # Linha 1 = cabeçalho
+            for line_no, record in enumerate(csv.DictReader(f), start=2):
+                yield split(line_no, record)
+
+def validate_entries(entries):
+    """Valida todas as linhas antes de conectar. Retorna a lista de erros."""
+    errors = []
+    for line_no, (data_coleta, veic_externo, _), updates in entries:
+        try:
+            datetime.strptime(data_coleta, "%d/%m/%Y")
+        except ValueError:
+            errors.append(f"linha {line_no}: data_coleta inválida '{data_coleta}' (use DD/MM/YYYY)")
+        if not veic_externo:
+            errors.append(f"linha {line_no}: veic_externo não informado")
+        if not updates:
+            errors.append(f"linha {line_no}: nenhuma coluna para alterar")
+        for col in updates:
+            if col not in ALLOWED_UPDATE_COLUMNS:
+                errors.append(f"linha {line_no}: a coluna '{col}' não é permitida")
+    return errors
+
+def resolve_rowids(cursor, entries):
+    """
+    Resolve os ROWIDs de um bloco de linhas com consultas por conjunto:
+    uma query por data e por grupo de até LOOKUP_IN_SIZE veículos.
+    Retorna {nº da linha: [rowids]}.
+    """
+    by_date = {}
+    for line_no, (data_coleta, veic_externo, _), _ in entries:
+        by_date.setdefault(data_coleta, set()).add(veic_externo)
+
+    in_list = ", ".join(f":v{i}" for i in range(LOOKUP_IN_SIZE))
+    sql = query_lookup.format(veiculos=in_list)
+    trips = {} # (data, veículo) -> [(rowid, ccit)]
+    for data_coleta, vehicles in by_date.items():
+        vehicles = sorted(vehicles)
+        for start in range(0, len(vehicles), LOOKUP_IN_SIZE):
+            chunk = vehicles[start:start + LOOKUP_IN_SIZE]
+            padded = chunk + [chunk[-1]] * (LOOKUP_IN_SIZE - len(chunk))
+            binds = {f"v{i}": v for i, v in enumerate(padded)}
+            binds["data_coleta"] = data_coleta
+            cursor.execute(sql, binds)
+            for rowid, veic, ccit in cursor:
+                trips.setdefault((data_coleta, str(veic)), []).append((rowid, "" if ccit is None else str(ccit)))
+
+    resolved = {}
+    for line_no, (data_coleta, veic_externo, ccit), _ in entries:
+        candidates = trips.get((data_coleta, veic_externo), [])
+        resolved[line_no] = [rowid for rowid, equ in candidates if not ccit or equ == ccit]
+    return resolved
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return int(json.load(f)["last_line"])
+
+def save_checkpoint(path, last_line):
+    # Grava em arquivo temporário e renomeia: o checkpoint nunca fica pela metade
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"last_line": last_line, "saved_at": datetime.now().isoformat(timespec="seconds")}, f)
+    os.replace(tmp_path, path)
+
+def run_batch(args):
+    """
+    Modo não interativo: aplica as correções do arquivo em blocos de
+    '--bloco' linhas. Cada bloco é uma transação (COMMIT ao final) e o
+    checkpoint registra a última linha comitada; rodar de novo continua dali.
+    """
+    started = time.perf_counter()
+    checkpoint_path = args.checkpoint or f"{args.arquivo}.checkpoint"
+
+    print("--- Script de Atualização em Lote ---")
+    print(f"Arquivo: {args.arquivo}")
+    entries = list(read_input_file(args.arquivo))
+    errors = validate_entries(entries)
+    if errors:
+        print(f"ERRO: {len(errors)} problema(s) no arquivo. Nada foi alterado.")
+        for error in errors[:20]:
+            print(f"  - {error}")
+        if len(errors) > 20:
+            print(f"  ... e mais {len(errors) - 20}.")
+        sys.exit(1)
+
+    last_done = load_checkpoint(checkpoint_path)
+    pending = [e for e in entries if e[0] > last_done]
+    totals = {"linhas_lidas": len(entries), "linhas_ja_processadas": len(entries) - len(pending),
+              "linhas_sem_viagens": 0, "viagens_atualizadas": 0, "blocos_comitados": 0}
+    if last_done:
+        print(f"Checkpoint encontrado: retomando após a linha {last_done} ({totals['linhas_ja_processadas']} linhas já processadas).")
+    if args.simular:
+        print("Modo SIMULAÇÃO: nenhuma alteração será gravada.")
+    print("------------------------------------------")
+
+    connection = None
+    cursor = None
+    try:
+        connection = connect()
+        cursor = connection.cursor()
+        cursor.arraysize = 1000
+
+        for start in range(0, len(pending), args.bloco):
+            block = pending[start:start + args.bloco]
+            resolved = resolve_rowids(cursor, block)
+
+            # Agrupa por conjunto de colunas: cada grupo é um único UPDATE (array DML)
+            groups = {}
+            for line_no, _, updates in block:
+                rowids = resolved[line_no]
+                if not rowids:
+                    totals["linhas_sem_viagens"] += 1
+                    continue
+                columns = tuple(sorted(updates))
+                values = {f"update_val_{i}": updates[col] for i, col in enumerate(columns)}
+                rows, origins = groups.setdefault(columns, ([], []))
+                for rowid in rowids:
+                    rows.append(dict(values, p_rowid=rowid))
+                    origins.append(line_no)
+
+            block_updated = 0
+            block_errors = []
+            for columns, (rows, origins) in groups.items():
+                sql = build_update_sql(columns)
+                for chunk_start in range(0, len(rows), args.lote):
+                    cursor.executemany(sql, rows[chunk_start:chunk_start + args.lote],
+                                       batcherrors=True, arraydmlrowcounts=True)
+                    block_updated += sum(cursor.getarraydmlrowcounts())
+                    block_errors.extend(
+                        (origins[chunk_start + error.offset], error.message)
+                        for error in cursor.getbatcherrors()
+                    )
+
+            if block_errors:
+                connection.rollback()
+                print(f"\nERRO em {len(block_errors)} viagem(ns) no bloco das linhas {block[0][0]} a {block[-1][0]}. ROLLBACK do bloco.")
+                for line_no, message in block_errors[:20]:
+                    print(f"  - linha {line_no}: {message}")
+                print("Corrija o arquivo e execute novamente: o processamento continua a partir deste bloco.")
+                break
+
+            if args.simular:
+                connection.rollback()
+            else:
+                connection.commit()
+                save_checkpoint(checkpoint_path, block[-1][0])
+            totals["viagens_atualizadas"] += block_updated
+            totals["blocos_comitados"] += 1
+            print(f"Bloco {totals['blocos_comitados']}: linhas {block[0][0]} a {block[-1][0]}, "
+                  f"{block_updated} viagens {'simuladas' if args.simular else 'atualizadas'}.")
+
+    except oracledb.Error as e:
+        print(f"\nERRO: {e}")
+        if connection:
+            print("Executando ROLLBACK do bloco atual. Blocos anteriores já estão comitados.")
+            connection.rollback()
+    except KeyboardInterrupt:
+        print("\nOperação interrompida pelo usuário (Ctrl+C). Executando ROLLBACK do bloco atual...")
+        if connection:
+            connection.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+        if connection:
+            connection.close()
+            print("Conexão fechada.")
+
+    # --- RELATÓRIO ---
+    print("\n--- RESUMO ---")
+    report = [
+        ("Linhas no arquivo", totals["linhas_lidas"]),
+        ("Já processadas (checkpoint)", totals["linhas_ja_processadas"]),
+        ("Linhas sem viagens", totals["linhas_sem_viagens"]),
+        ("Viagens simuladas" if args.simular else "Viagens atualizadas", totals["viagens_atualizadas"]),
+        ("Blocos simulados" if args.simular else "Blocos comitados", totals["blocos_comitados"]),
+        ("Tempo total", f"{time.perf_counter() - started:.1f}s"),
+    ]
+    for label, value in report:
+        print(f"{label + ':':<30} {value}")
+
+    # ROLLBACK de bloco, erro do banco ou Ctrl+C: código de saída de erro
+    if totals["blocos_comitados"] < -(-len(pending) // args.bloco):
+        sys.exit(1)
+
+# --- MODO PERÍODO (--data-fim) ---
+# Arquivos de partição abertos ao mesmo tempo no merge em disco
+MERGE_MAX_OPEN_FILES = 100
+
+def _set_role_callback(connection, requested_tag):
+    """Callback do pool: ativa a ROLE só quando uma sessão nova é criada."""
+    cursor = connection.cursor()
+    cursor.execute(plsql_set_role)
+    cursor.close()
+
+def build_partitions(data_inicio, data_fim, vehicles, mode):
+    """
+    Divide o período em partições independentes:
+    'data' = um dia por partição (todos os veículos informados),
+    'veiculo' = um veículo por partição (período inteiro),
+    'data-veiculo' = uma partição por dia e veículo.
+    Cada partição é (data_inicio, data_fim, [veículos]); lista vazia = todos.
+    """
+    start = datetime.strptime(data_inicio, "%d/%m/%Y")
+    end = datetime.strptime(data_fim, "%d/%m/%Y")
+    if end < start:
+        raise ValueError("A data final é anterior à data inicial.")
+    days = [(start + timedelta(days=i)).strftime("%d/%m/%Y") for i in range((end - start).days + 1)]
+    if mode in ("veiculo", "data-veiculo") and not vehicles:
+        raise ValueError(f"O particionamento '{mode}' exige a lista de veículos (-v).")
+
+    # Listas IN com no máximo LOOKUP_IN_SIZE veículos
+    vehicle_groups = [vehicles[i:i + LOOKUP_IN_SIZE] for i in range(0, len(vehicles), LOOKUP_IN_SIZE)] or [[]]
+    if mode == "data":
+        return [(day, day, group) for day in days for group in vehicle_groups]
+    if mode == "veiculo":
+        return [(data_inicio, data_fim, [vehicle]) for vehicle in vehicles]
+    return [(day, day, [vehicle]) for day in days for vehicle in vehicles]
+
+def partition_query(partition, ccit):
+    """SELECT de uma partição. O texto SQL só varia pela forma do filtro de veículos."""
+    data_inicio, data_fim, vehicles = partition
+    sql = query_select_base + """ AND
+    a.rop_data_coleta BETWEEN TO_DATE(:data_inicio, 'DD/MM/YYYY') AND TO_DATE(:data_fim, 'DD/MM/YYYY')"""
+    binds = {"data_inicio": data_inicio, "data_fim": data_fim}
+    if len(vehicles) == 1:
+        sql += " AND v.vei_cod_veiculo_externo = :veic_externo"
+        binds["veic_externo"] = vehicles[0]
+    elif vehicles:
+        padded = vehicles + [vehicles[-1]] * (LOOKUP_IN_SIZE - len(vehicles))
+        sql += f" AND v.vei_cod_veiculo_externo IN ({', '.join(f':v{i}' for i in range(LOOKUP_IN_SIZE))})"
+        binds.update({f"v{i}": v for i, v in enumerate(padded)})
+    if ccit:
+        sql += " AND e.equ_num_serie = :ccit_ext"
+        binds["ccit_ext"] = ccit
+    sql += f" ORDER BY a.{ORDER_COLUMN} ASC"
+    return sql, binds
+
+def fetch_partition(pool, partition, ccit, part_path=None):
+    """
+    Executa uma partição em uma sessão do pool. Com 'part_path' as linhas
+    vão direto para um CSV (ordenado), sem ficar em memória.
+    Retorna (colunas, linhas ou None, quantidade).
+    """
+    sql, binds = partition_query(partition, ccit)
+    with pool.acquire() as connection:
+        cursor = connection.cursor()
+        cursor.arraysize = 1000
+        cursor.prefetchrows = 1000
+        cursor.execute(sql, binds)
+        col_names = [desc[0] for desc in cursor.description]
+        if part_path is None:
+            rows = cursor.fetchall()
+            return col_names, rows, len(rows)
+
+        count = 0
+        with open(part_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(col_names)
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                writer.writerows(rows)
+                count += len(rows)
+        return col_names, None, count
+
+def _order_key(value):
+    # Nulos por último, como no ORDER BY ... ASC do Oracle
+    return (value is None or value == "", value if value is not None else "")
+
+def _merge_csv_files(paths, dest_path, order_index):
+    """Merge (k-way) de CSVs já ordenados, lendo uma linha de cada por vez."""
+    files = [open(path, encoding="utf-8", newline="") for path in paths]
+    try:
+        readers = [csv.reader(f) for f in files]
+        header = [next(reader) for reader in readers][0]
+        with open(dest_path, "w", encoding="utf-8", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(header)
+            writer.writerows(heapq.merge(*readers, key=lambda row: _order_key(row[order_index])))
+    finally:
+        for f in files:
+            f.close()
+    for path in paths:
+        os.remove(path)
+
+def merge_partition_files(paths, dest_path, order_index):
+    """Junta os CSVs das partições em um só, limitando os arquivos abertos."""
+    level = 0
+    while len(paths) > MERGE_MAX_OPEN_FILES:
+        merged = []
+        for i in range(0, len(paths), MERGE_MAX_OPEN_FILES):
+            partial = f"{dest_path}.merge{level}_{i}.part"
+            _merge_csv_files(paths[i:i + MERGE_MAX_OPEN_FILES], partial, order_index)
+            merged.append(partial)
+        paths = merged
+        level += 1
+    _merge_csv_files(paths, dest_path, order_index)
+
+def search_range(args):
+    """
+    Busca o período em partições paralelas (pool de até '--threads' sessões).
+    Retorna (colunas, linhas ordenadas por VIA_DATAHORA_INICIO_OPERACAO), ou
+    (colunas, None) quando o resultado foi gravado em '--saida'.
+    """
+    vehicles = [v.strip() for v in (args.veiculo or "").split(",") if v.strip()]
+    partitions = build_partitions(args.data, args.data_fim, vehicles, args.particionar)
+    print(f"Buscando {len(partitions)} partição(ões) ({args.particionar}) com até {args.threads} sessões em paralelo...")
+
+    part_paths = {}
+    if args.saida:
+        os.makedirs(args.saida, exist_ok=True)
+        part_paths = {i: os.path.join(args.saida, f"particao_{i:05d}.csv.part") for i in range(len(partitions))}
+
+    started = time.perf_counter()
+    pool = oracledb.create_pool(user=DB_USER, password=DB_PASSWORD, dsn=DB_DSN,
+                                min=1, max=args.threads, increment=1,
+                                session_callback=_set_role_callback)
+    results = {}
+    col_names = None
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            futures = {
+                executor.submit(fetch_partition, pool, partition, args.ccit, part_paths.get(i)): i
+                for i, partition in enumerate(partitions)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                col_names, rows, count = future.result()
+                results[i] = rows
+                data_inicio, data_fim, part_vehicles = partitions[i]
+                period = data_inicio if data_inicio == data_fim else f"{data_inicio} a {data_fim}"
+                label = ", ".join(part_vehicles[:3]) + ("..." if len(part_vehicles) > 3 else "") if part_vehicles else "todos"
+                print(f"[{done}/{len(partitions)}] {period} / veículos: {label}: {count} viagens")
+    finally:
+        pool.close(force=True)
+
+    order_index = col_names.index(ORDER_COLUMN)
+    if args.saida:
+        dest_path = os.path.join(args.saida, "viagens.csv")
+        merge_partition_files([part_paths[i] for i in range(len(partitions))], dest_path, order_index)
+        print(f"Resultado gravado em {dest_path} ({time.perf_counter() - started:.1f}s).")
+        return col_names, None
+
+    # Cada partição já vem ordenada: basta intercalar
+    merged = list(heapq.merge(*(results[i] for i in range(len(partitions))),
+                              key=lambda row: _order_key(row[order_index])))
+    print(f"{len(merged)} viagens em {time.perf_counter() - started:.1f}s.")
+    return col_names, merged
 
 def main():
     parser = argparse.ArgumentParser(description="Busca e atualiza registros na tabela ro_viagens de forma interativa.")
     
-    parser.add_argument("-d", "--data", required=True, 
+    parser.add_argument("-d", "--data", 
                         help="Data da coleta (filtro OBRIGATÓRIO, formato 'DD/MM/YYYY')")
-    parser.add_argument("-v", "--veiculo", required=True, 
+    parser.add_argument("-v", "--veiculo", 
                         help="Código do veículo externo (filtro OBRIGATÓRIO)")
     parser.add_argument("-c", "--ccit", 
                         help="Código CCIT Externo (filtro opcional para e.equ_num_serie)")
+
+    # Modo lote (não interativo)
+    parser.add_argument("-a", "--arquivo",
+                        help="CSV/JSONL com data_coleta, veic_externo, ccit e as colunas a alterar (modo lote)")
+    parser.add_argument("--bloco", type=int, default=200,
+                        help="Linhas do arquivo por transação/checkpoint no modo lote (padrão: 200)")
+    parser.add_argument("--lote", type=int, default=500,
+                        help="Viagens por round-trip do UPDATE (array DML) no modo lote (padrão: 500)")
+    parser.add_argument("--checkpoint",
+                        help="Arquivo de checkpoint do modo lote (padrão: <arquivo>.checkpoint)")
+    parser.add_argument("--simular", action="store_true",
+                        help="Modo lote: executa tudo e desfaz (ROLLBACK), sem gravar")
+
+    # Modo período (busca paralela)
+    parser.add_argument("--data-fim",
+                        help="Data final (DD/MM/YYYY): busca de --data até --data-fim; -v aceita vários veículos separados por vírgula")
+    parser.add_argument("--particionar", choices=["data", "veiculo", "data-veiculo"], default="data",
+                        help="Como dividir o período entre as sessões paralelas (padrão: data)")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="Partições executadas ao mesmo tempo (sessões do pool, padrão: 4)")
+    parser.add_argument("--saida",
+                        help="Pasta onde gravar o resultado (CSV ordenado) em vez de mantê-lo em memória")
     
     try:
         args = parser.parse_args()
     except SystemExit:
         sys.exit(1)
 
+    if args.arquivo:
+        run_batch(args)
+        return
+    if not args.data or not (args.veiculo or args.data_fim):
+        parser.print_usage()
+        print("ERRO: informe --data e --veiculo (modo interativo) ou --arquivo (modo lote).")
+        sys.exit(1)
+
     print("--- Script de Atualização Interativa ---")
-    print(f"Filtro Data: {args.data}")
-    print(f"Filtro Veículo: {args.veiculo}")
+    print(f"Filtro Data: {args.data}" + (f" a {args.data_fim}" if args.data_fim else ""))
+    print(f"Filtro Veículo: {args.veiculo or 'todos'}")
     if args.ccit:
         print(f"Filtro CCIT: {args.ccit}")
     print("------------------------------------------")
@@ -71,31 +521,33 @@ def main():
     connection = None
     cursor = None
     try:
-        print(f"Conectando ao banco de dados em {DB_DSN}...")
-        connection = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=DB_DSN)
-        cursor = connection.cursor()
-        print("Conexão bem-sucedida!")
+        if args.data_fim:
+            col_names, rows_to_update = search_range(args)
+            if rows_to_update is None:
+                print("Para corrigir as viagens, gere um arquivo de correções e use --arquivo.")
+                sys.exit(0)
 
-        print("Definindo a ROLE...")
-        cursor.execute(plsql_set_role)
-        print("ROLE definida com sucesso.")
+        connection = connect()
+        cursor = connection.cursor()
 
-        print("Buscando registros...")
-        
-        bind_params_select = {
-            "data_coleta": args.data,
-            "veic_externo": args.veiculo
-        }
-
-        query_select_final = query_select
-        if args.ccit:
-            query_select_final += " AND e.equ_num_serie = :ccit_ext"
-            bind_params_select["ccit_ext"] = args.ccit
+        if not args.data_fim:
+            print("Buscando registros...")
             
-        query_select_final += " ORDER BY a.VIA_DATAHORA_INICIO_OPERACAO ASC"
+            bind_params_select = {
+                "data_coleta": args.data,
+                "veic_externo": args.veiculo
+            }
 
-        cursor.execute(query_select_final, bind_params_select)
-        rows_to_update = cursor.fetchall()
+            query_select_final = query_select
+            if args.ccit:
+                query_select_final += " AND e.equ_num_serie = :ccit_ext"
+                bind_params_select["ccit_ext"] = args.ccit
+                
+            query_select_final += " ORDER BY a.VIA_DATAHORA_INICIO_OPERACAO ASC"
+
+            cursor.execute(query_select_final, bind_params_select)
+            rows_to_update = cursor.fetchall()
+            col_names = [desc[0] for desc in cursor.description]
 
         if not rows_to_update:
             print("Nenhum registro encontrado com os filtros fornecidos. Nenhuma alteração será feita.")
@@ -103,7 +555,6 @@ def main():
 
         # --- 4. EXIBIR RESULTADOS ---
         print(f"\n--- {len(rows_to_update)} REGISTROS ENCONTRADOS ---")
-        col_names = [desc[0] for desc in cursor.description]
         headers = col_names[1:] # Não mostra ROWID
         
         print(f"{'INDEX':<5} | {' | '.join(headers)}")
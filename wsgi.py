@@ -0,0 +1,49 @@
+import os
+
+import oracledb
+from app import create_app, db
+from app.core import query_manager
+from app.core.jobs import job_manager
+from config import Config
+
+# Entrada WSGI de produção (gunicorn.conf.py / serve.py).
+# A aplicação é construída uma única vez; com 'preload_app' do gunicorn isso
+# acontece no processo mestre e os workers herdam tudo já carregado.
+app = create_app()
+
+# Catálogo lido antes do fork: os workers herdam o snapshot já parseado
+query_manager.get_queries_list_full()
+
+def sizing_report(workers, threads, bind=Config.SERVER_BIND):
+    """Resumo de processos, threads e sessões Oracle (exibido ao iniciar)."""
+    lines = [
+        f"Servidor: {workers} worker(s) x {threads} thread(s) em {bind}",
+        f"Pool Oracle por worker: min={Config.DB_POOL_MIN}, max={Config.DB_POOL_MAX} "
+        f"(até {workers * Config.DB_POOL_MAX} sessões no total)",
+    ]
+    if threads > Config.DB_POOL_MAX:
+        lines.append(f"AVISO: {threads} threads para {Config.DB_POOL_MAX} sessões por worker: "
+                     f"requisições vão esperar por sessão livre (até {Config.DB_POOL_WAIT_TIMEOUT}s).")
+    if workers > 1:
+        lines.append(f"AVISO: {workers} workers: cache de resultados e updates assíncronos desligados; "
+                     f"admissão (ADMISSION_*) e /metrics valem por worker.")
+    return "\n".join(lines)
+
+def warm_worker():
+    """
+    Abre o pool de sessões do processo (DB_POOL_MIN sessões, ROLE ativa)
+    antes da primeira requisição. Sempre depois do fork: sessões Oracle
+    não podem ser compartilhadas entre processos.
+    """
+    try:
+        pool = db.get_pool()
+        print(f"Worker {os.getpid()}: pool de sessões pronto (min={pool.min}, max={pool.max}).")
+    except (oracledb.Error, ValueError) as e:
+        # O worker sobe mesmo assim; o pool é criado na primeira requisição
+        print(f"AVISO: Worker {os.getpid()}: não foi possível abrir o pool de sessões: {e}")
+
+def shutdown_worker():
+    """Desligamento: termina os jobs em andamento e fecha o pool de sessões."""
+    job_manager.shutdown()
+    db.close_pool()
+    print(f"Worker {os.getpid()}: pool de sessões fechado.")